@@ -0,0 +1,75 @@
+"""Асинхронные представления API для запуска под ASGI.
+
+В Django 3.2 нет асинхронного ORM, а DRF 3.11 не поддерживает
+асинхронные представления. Синхронные представления Django под ASGI
+выполняет в одном общем потоке процесса, и запросы ждут друг друга.
+Поэтому представления DRF оборачиваются в асинхронные: код с
+обращениями к базе и рендеринг ответа выполняются через sync_to_async
+в отдельном пуле потоков, а отдачу ответа медленному клиенту берёт на
+себя цикл событий и не занимает поток.
+
+Оборачиваются только маршруты с частыми запросами чтения (ASYNC_ROUTES
+в api.urls). Редкие записи, выгрузки и метрики Django выполняет как
+обычно: пул им ничего не даёт, а потоки пула вместе с их соединениями
+с базой остаются горячему чтению.
+"""
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_THREADS,
+    thread_name_prefix='api-view',
+)
+
+
+def run_view(view, request, *args, **kwargs):
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            started = time.perf_counter()
+            response.render()
+            request.render_duration = time.perf_counter() - started
+        return response
+    finally:
+        # Сигнал request_finished придёт в другом потоке: соединения
+        # этого потока закрываются (возвращаются в пул) здесь.
+        close_old_connections()
+
+
+def asynchronous(view):
+    """Асинхронная обёртка синхронного представления."""
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await sync_to_async(
+            run_view, thread_sensitive=False, executor=executor
+        )(view, request, *args, **kwargs)
+
+    return async_view
+
+
+def asynchronous_urls(patterns, names):
+    """Оборачивает представления маршрутов с именами из names, включая
+    вложенные include."""
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern,
+                asynchronous_urls(pattern.url_patterns, names),
+                pattern.default_kwargs, pattern.app_name, pattern.namespace,
+            )
+        elif pattern.name in names:
+            pattern = URLPattern(
+                pattern.pattern, asynchronous(pattern.callback),
+                pattern.default_args, pattern.name,
+            )
+        result.append(pattern)
+    return result
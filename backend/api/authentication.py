@@ -0,0 +1,119 @@
+"""Аутентификация по токену с кешем.
+
+TokenAuthentication DRF на каждый запрос ищет токен вместе с
+пользователем в базе. CachedTokenAuthentication сначала ищет
+пользователя в LRU процесса, затем id пользователя в общем кеше (если
+включён TOKEN_CACHE_SHARED) и только потом токен в базе. В общем кеше
+хранится только id: строка пользователя при промахе LRU читается из
+базы. Записи обоих кешей живут TOKEN_CACHE_TTL секунд и действуют, пока
+не сменилась метка версии пользователя: её меняют удаление его токена
+(выход), смена пароля и любое изменение пользователя, поэтому сброс
+сразу виден всем воркерам и не задевает других пользователей.
+"""
+import copy
+import hashlib
+import threading
+import time
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from recipes.versions import get_version
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .metrics import registry
+from users.models import User
+
+USER_VERSION = 'token_user:{}'
+SHARED_KEY = 'token_user_id:{}'
+
+
+def shared_key(key):
+    return SHARED_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def user_version(user_id):
+    return get_version(USER_VERSION.format(user_id))
+
+
+class TokenCache:
+    """LRU процесса: ключ токена → (пользователь, версия, срок)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, version, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        if version != user_version(user.id):
+            self.discard(key)
+            return None
+        return user
+
+    def set(self, key, user, version):
+        with self._lock:
+            self._entries[key] = (
+                user, version, time.monotonic() + settings.TOKEN_CACHE_TTL
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    @staticmethod
+    def shared_user(key):
+        """Пользователь по id из общего кеша; None, если записи нет,
+        она устарела или пользователь недоступен."""
+        entry = cache.get(shared_key(key))
+        if entry is None:
+            return None, None
+        user_id, version = entry
+        # Версию читаем до строки пользователя: изменение между ними
+        # сменит версию, и запись LRU не переживёт его.
+        current = user_version(user_id)
+        if version != current:
+            return None, None
+        user = User.objects.filter(id=user_id, is_active=True).first()
+        return user, current
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        source = 'local'
+        if user is None and settings.TOKEN_CACHE_SHARED:
+            source = 'shared'
+            user, version = self.shared_user(key)
+        if user is None:
+            source = 'miss'
+            token = Token.objects.only('user_id').filter(key=key).first()
+            version = user_version(token.user_id) if token else None
+            user = super().authenticate_credentials(key)[0]
+            if settings.TOKEN_CACHE_SHARED:
+                cache.set(
+                    shared_key(key), (user.id, version),
+                    settings.TOKEN_CACHE_TTL,
+                )
+        if source != 'local':
+            token_cache.set(key, user, version)
+        registry.increment('foodgram_token_cache_total', (('source', source),))
+        # Один объект из LRU не должен разделяться между запросами.
+        user = copy.copy(user)
+        return user, Token(key=key, user=user)
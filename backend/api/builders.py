@@ -0,0 +1,229 @@
+"""Карточки рецептов без сериализаторов DRF.
+
+recipe_cards собирает словари той же схемы, что и RecipeReadSerializer.
+Общая для всех часть карточки (фрагмент) хранится в кеше по id рецепта
+и версиям рецепта, автора, тегов и ингредиентов; поверх фрагмента
+накладываются поля пользователя запроса из строки страницы:
+is_favorited, is_in_shopping_cart и author.is_subscribed. Фрагменты,
+которых нет в кеше, строятся из строк .values(): теги и ингредиенты
+берутся из справочников в памяти процесса, поэтому связи рецептов с
+ними читаются без соединения таблиц. Совпадение вывода с
+сериализаторами проверяет tests/test_recipe_cards.py.
+"""
+import hashlib
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Exists, OuterRef, Value
+from foodgram.replicas import primary_reads
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from recipes.versions import (
+    AUTHOR_VERSION, RECIPE_VERSION, get_version, get_versions,
+)
+
+from .ingredient_index import ingredient_index
+from users.models import Follow, User
+
+ROW_FIELDS = (
+    'id', 'pub_date', 'author_id', 'is_favorited', 'is_in_shopping_cart',
+    'author_is_subscribed',
+)
+FRAGMENT_FIELDS = (
+    'id', 'author_id', 'name', 'image', 'image_variants', 'text',
+    'cooking_time',
+)
+FRAGMENT_KEY = 'recipe_card:{}:{}'
+
+
+class TagRows:
+    """Теги по id в схеме TagSerializer, закэшированные в процессе до
+    смены версии справочника тегов."""
+
+    def __init__(self):
+        self._version = None
+        self._rows = {}
+
+    def get(self, ids):
+        version = get_version('tags')
+        if version != self._version or not self._rows.keys() >= ids:
+            with primary_reads():
+                self._rows = {
+                    row['id']: row for row in Tag.objects.values(
+                        'id', 'name', 'color', 'slug'
+                    )
+                }
+            self._version = version
+        return self._rows
+
+
+tag_rows = TagRows()
+
+
+def image_variant_urls(image, variants, build_url):
+    """Адреса копий изображения; пусто, если копии не от image."""
+    if not image or variants.get('source') != image:
+        return {}
+    return {
+        variant: {
+            image_format: build_url(default_storage.url(path))
+            for image_format, path in paths.items()
+        }
+        for variant, paths in variants.items() if variant != 'source'
+    }
+
+
+def recipe_rows(queryset, user):
+    """Строки страницы рецептов для recipe_cards: только поля, нужные
+    для пагинации и наложения полей пользователя."""
+    if user.is_anonymous:
+        is_subscribed = Value(False)
+    else:
+        is_subscribed = Exists(Follow.objects.filter(
+            user=user, author=OuterRef('author_id')
+        ))
+    return queryset.prefetch_related(None).annotate(
+        author_is_subscribed=is_subscribed
+    ).values(*ROW_FIELDS)
+
+
+def recipe_tags(ids):
+    links = Recipe.tags.through.objects.filter(
+        recipe_id__in=ids
+    ).order_by('-tag_id').values_list('recipe_id', 'tag_id')
+    tags = tag_rows.get({tag_id for _, tag_id in links})
+    result = defaultdict(list)
+    for recipe_id, tag_id in links:
+        result[recipe_id].append(tags[tag_id])
+    return result
+
+
+def recipe_ingredients(ids):
+    amounts = IngredientAmount.objects.filter(
+        recipe_id__in=ids
+    ).order_by('id').values_list('recipe_id', 'ingredient_id', 'amount')
+    ingredients = ingredient_index.rows()
+    missing = {
+        ingredient_id for _, ingredient_id, _ in amounts
+        if ingredient_id not in ingredients
+    }
+    if missing:
+        # Ингредиент добавлен после построения индекса.
+        ingredients = {**ingredients, **{
+            row['id']: row for row in Ingredient.objects.filter(
+                id__in=missing
+            ).values('id', 'name', 'measurement_unit')
+        }}
+    result = defaultdict(list)
+    for recipe_id, ingredient_id, amount in amounts:
+        ingredient = ingredients[ingredient_id]
+        result[recipe_id].append({
+            'id': ingredient_id,
+            'name': ingredient['name'],
+            'measurement_unit': ingredient['measurement_unit'],
+            'amount': amount,
+        })
+    return result
+
+
+def recipe_authors(ids):
+    return {
+        row['id']: {**row, 'is_subscribed': False}
+        for row in User.objects.filter(id__in=ids).values(
+            'id', 'email', 'username', 'first_name', 'last_name'
+        )
+    }
+
+
+def build_fragments(ids, request):
+    """Фрагменты карточек рецептов ids с полями пользователя по
+    умолчанию."""
+    rows = list(Recipe.objects.filter(id__in=ids).values(*FRAGMENT_FIELDS))
+    if not rows:
+        return {}
+    ids = [row['id'] for row in rows]
+    tags = recipe_tags(ids)
+    ingredients = recipe_ingredients(ids)
+    authors = recipe_authors({row['author_id'] for row in rows})
+    build_url = request.build_absolute_uri
+    return {
+        row['id']: {
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'author': authors[row['author_id']],
+            'ingredients': ingredients[row['id']],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'name': row['name'],
+            'image': (
+                build_url(default_storage.url(row['image']))
+                if row['image'] else None
+            ),
+            'image_variants': image_variant_urls(
+                row['image'], row['image_variants'], build_url
+            ),
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        }
+        for row in rows
+    }
+
+
+def fragment_keys(rows, request):
+    """Ключи фрагментов: адреса изображений абсолютные, поэтому в ключ
+    входит и адрес сайта."""
+    versions = get_versions({
+        'tags', 'ingredients',
+        *(RECIPE_VERSION.format(row['id']) for row in rows),
+        *(AUTHOR_VERSION.format(row['author_id']) for row in rows),
+    })
+    site = request.build_absolute_uri('/')
+    return {
+        row['id']: FRAGMENT_KEY.format(row['id'], hashlib.sha256(':'.join((
+            site, versions['tags'], versions['ingredients'],
+            versions[RECIPE_VERSION.format(row['id'])],
+            versions[AUTHOR_VERSION.format(row['author_id'])],
+        )).encode()).hexdigest())
+        for row in rows
+    }
+
+
+def recipe_cards(rows, request):
+    """Карточки рецептов страницы в схеме RecipeReadSerializer."""
+    rows = list(rows)
+    if not rows:
+        return []
+    if not settings.RECIPE_CARD_CACHE:
+        fragments = build_fragments([row['id'] for row in rows], request)
+        return overlay_cards(rows, fragments)
+    keys = fragment_keys(rows, request)
+    cached = cache.get_many(keys.values())
+    fragments = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [row['id'] for row in rows if row['id'] not in fragments]
+    if missing:
+        with primary_reads():
+            built = build_fragments(missing, request)
+        cache.set_many(
+            {keys[pk]: fragment for pk, fragment in built.items()},
+            settings.RECIPE_CARD_CACHE_TTL,
+        )
+        fragments.update(built)
+    return overlay_cards(rows, fragments)
+
+
+def overlay_cards(rows, fragments):
+    """Поля пользователя запроса поверх фрагментов карточек."""
+    return [
+        {
+            **fragments[row['id']],
+            'author': {
+                **fragments[row['id']]['author'],
+                'is_subscribed': row['author_is_subscribed'],
+            },
+            'is_favorited': row['is_favorited'],
+            'is_in_shopping_cart': row['is_in_shopping_cart'],
+        }
+        for row in rows if row['id'] in fragments
+    ]
@@ -0,0 +1,105 @@
+"""Массовое добавление и удаление связей пользователя с объектами.
+
+bulk_links обрабатывает список id за один запрос: находит существующие
+объекты и связи двумя запросами, создаёт новые связи одним
+bulk_create (create_links) или удаляет их одним delete и
+возвращает результат по каждому id в порядке запроса.
+
+Как и одиночные запросы, bulk_links сначала блокирует строку
+пользователя (users.models.lock_users).
+"""
+from django.db import IntegrityError, transaction
+from recipes import counters
+from rest_framework import status
+from rest_framework.response import Response
+
+from .serializers import BulkIdsSerializer
+from users.models import lock_users
+
+CREATED = 'created'
+DELETED = 'deleted'
+ERROR = 'error'
+
+
+def create_links(model, user, key, pks):
+    """Создаёт связи пользователя с объектами pks и возвращает id
+    действительно созданных.
+
+    Все пути API сначала берут блокировку пользователя, поэтому
+    конфликт возможен только со связью, созданной в обход неё. Тогда
+    существующие связи перечитываются, а остальные создаются по одной.
+    """
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(
+                [model(user=user, **{key: pk}) for pk in pks]
+            )
+        return pks
+    except IntegrityError:
+        pass
+    existing = set(model.objects.filter(
+        user=user, **{f'{key}__in': pks}
+    ).values_list(key, flat=True))
+    created = []
+    for pk in pks:
+        if pk in existing:
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([model(user=user, **{key: pk})])
+        except IntegrityError:
+            continue
+        created.append(pk)
+    return created
+
+
+def bulk_links(request, model, field, targets, messages, rejected=None):
+    """Связывает пользователя запроса с объектами targets (POST) или
+    удаляет связи (DELETE).
+
+    model — модель связи с полями user и field, messages — тексты
+    ошибок not_found, exists и missing, rejected — {id: текст ошибки}
+    для объектов, которые нельзя связать. Возвращает id действительно
+    созданных или удалённых связей и ответ с результатами. Вызывается
+    в transaction.atomic.
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    user = request.user
+    lock_users([user.id])
+    key = f'{field}_id'
+    found = set(targets.filter(id__in=ids).values_list('id', flat=True))
+    linked = set(model.objects.filter(
+        user=user, **{f'{key}__in': ids}
+    ).values_list(key, flat=True))
+    errors = {pk: messages['not_found'] for pk in ids if pk not in found}
+    if request.method == 'POST':
+        errors.update({pk: messages['exists'] for pk in linked})
+        errors.update(rejected or {})
+        changed = create_links(
+            model, user, key, [pk for pk in ids if pk not in errors]
+        )
+        created = set(changed)
+        errors.update({
+            pk: messages['exists']
+            for pk in ids if pk not in errors and pk not in created
+        })
+        # bulk_create не отправляет post_save, счётчики меняем сами;
+        # при удалении их уменьшают сигналы post_delete.
+        for counted, counter, source, source_key in counters.COUNTERS:
+            if source is model and source_key == field:
+                counters.change_many(counted, changed, counter, 1)
+        done = CREATED
+    else:
+        errors.update({pk: messages['missing'] for pk in found - linked})
+        changed = [pk for pk in ids if pk not in errors]
+        if changed:
+            model.objects.filter(user=user, **{f'{key}__in': changed}).delete()
+        done = DELETED
+    results = [
+        {'id': pk, 'status': ERROR, 'errors': errors[pk]}
+        if pk in errors else {'id': pk, 'status': done}
+        for pk in ids
+    ]
+    return changed, Response({'results': results}, status=status.HTTP_200_OK)
@@ -0,0 +1,111 @@
+import logging
+import multiprocessing
+import tempfile
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+
+import django
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from recipes.models import ShoppingListExport
+
+from .utils import render_pdf, shopping_list_lines
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    """Пул процессов для выгрузок, отдельный от воркеров gunicorn.
+
+    Процессы запускаются через spawn, чтобы не наследовать открытые
+    соединения с базой данных, и сами настраивают Django.
+    """
+    return ProcessPoolExecutor(
+        max_workers=settings.SHOPPING_LIST_EXPORT_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def render_export(export_id):
+    try:
+        updated = ShoppingListExport.objects.filter(
+            id=export_id, status=ShoppingListExport.PENDING
+        ).update(status=ShoppingListExport.RUNNING)
+        if not updated:
+            return
+        export = ShoppingListExport.objects.select_related('user').get(
+            id=export_id
+        )
+        ingredients = export.user.shopping_list.values(
+            'ingredient__name', 'ingredient__measurement_unit',
+            sum_amount=F('amount'),
+        ).order_by('ingredient__name')
+        with tempfile.TemporaryFile() as buffer:
+            render_pdf(shopping_list_lines(ingredients.iterator()), buffer)
+            buffer.seek(0)
+            export.file.save(
+                f'{export.id}.pdf', File(buffer), save=False
+            )
+        export.status = ShoppingListExport.DONE
+        export.finished = timezone.now()
+        export.save(update_fields=('status', 'file', 'finished'))
+    except Exception:
+        logger.exception('Не удалось сформировать выгрузку %s', export_id)
+        ShoppingListExport.objects.filter(id=export_id).update(
+            status=ShoppingListExport.FAILED, finished=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+def export_finished(export_id, future):
+    """Помечает задание ошибочным, если его процесс погиб и render_export
+    не успел записать статус."""
+    error = future.exception()
+    if error is None:
+        return
+    if isinstance(error, BrokenProcessPool):
+        # Пул с погибшим процессом больше не принимает задания.
+        get_executor.cache_clear()
+    logger.error('Процесс выгрузки %s завершился с ошибкой: %r',
+                 export_id, error)
+    try:
+        ShoppingListExport.objects.filter(
+            id=export_id,
+            status__in=(
+                ShoppingListExport.PENDING, ShoppingListExport.RUNNING
+            ),
+        ).update(status=ShoppingListExport.FAILED, finished=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def submit_export(export_id):
+    try:
+        future = get_executor().submit(render_export, export_id)
+    except BrokenProcessPool:
+        # Процесс пула погиб после прошлого задания: пул пересоздаём.
+        get_executor.cache_clear()
+        try:
+            future = get_executor().submit(render_export, export_id)
+        except BrokenProcessPool as error:
+            future = Future()
+            future.set_exception(error)
+    future.add_done_callback(partial(export_finished, export_id))
+
+
+def start_export(user):
+    """Создаёт задание на выгрузку списка покупок и ставит его в очередь
+    пула после фиксации транзакции. Старые выгрузки удаляет команда
+    purge_shopping_list_exports."""
+    export = ShoppingListExport.objects.create(user=user)
+    transaction.on_commit(partial(submit_export, export.id))
+    return export
@@ -1,33 +1,74 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
 from django_filters import FilterSet, rest_framework as filters
+from foodgram.replicas import primary_reads
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
+from recipes.versions import get_version
+
+from .ingredient_index import ingredient_index
 
 User = get_user_model()
 
 
 class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def filter_name(self, queryset, name, value):
+        return queryset.filter(id__in=ingredient_index.search_ids(value))
+
+
+class TagSlugs:
+    """Соответствие slug → id тегов, закэшированное в процессе
+    до смены версии справочника тегов."""
+
+    def __init__(self):
+        self._version = None
+        self._ids = {}
+
+    def ids(self):
+        version = get_version('tags')
+        if version != self._version:
+            with primary_reads():
+                self._ids = dict(Tag.objects.values_list('slug', 'id'))
+            self._version = version
+        return self._ids
+
+    def choices(self):
+        return [(slug, slug) for slug in self.ids()]
+
+
+tag_slugs = TagSlugs()
+
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_slugs.choices,
+        method='filter_tags',
     )
 
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
 
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов: подзапрос EXISTS
+        не размножает строки, поэтому DISTINCT не нужен."""
+        ids = tag_slugs.ids()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            tag_id__in=[ids[slug] for slug in value if slug in ids],
+        )))
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
@@ -39,3 +80,6 @@ class RecipeFilter(FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(shopping_cart__user=user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
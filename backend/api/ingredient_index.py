@@ -0,0 +1,85 @@
+import threading
+
+from bisect import bisect_left
+
+from foodgram.replicas import primary_reads
+from recipes.models import Ingredient
+from recipes.versions import get_version
+
+MAX_CHAR = chr(0x10FFFF)
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Названия хранятся в нижнем регистре в отсортированных списках,
+    поиск по префиксу выполняется бинарным поиском. Сначала идут
+    ингредиенты, название которых начинается с запроса, затем те,
+    у которых с запроса начинается одно из следующих слов. Индекс
+    перестраивается, когда меняется версия справочника ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = ((), (), (), (), {})
+
+    def _build(self):
+        rows = {
+            row['id']: row for row in Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        names = []
+        words = []
+        for row in rows.values():
+            name = row['name'].casefold()
+            names.append((name, row['id']))
+            for position, char in enumerate(name):
+                if position and char.isalnum() and (
+                    not name[position - 1].isalnum()
+                ):
+                    words.append((name[position:], row['id']))
+        names.sort()
+        words.sort()
+        return (
+            tuple(key for key, _ in names),
+            tuple(pk for _, pk in names),
+            tuple(key for key, _ in words),
+            tuple(pk for _, pk in words),
+            rows,
+        )
+
+    def _get_data(self):
+        version = get_version('ingredients')
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    with primary_reads():
+                        self._data = self._build()
+                    self._version = version
+        return self._data
+
+    @staticmethod
+    def _match(keys, ids, prefix):
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + MAX_CHAR, start)
+        return ids[start:end]
+
+    def search_ids(self, prefix):
+        names, name_ids, words, word_ids, _ = self._get_data()
+        prefix = prefix.casefold()
+        found = dict.fromkeys(self._match(names, name_ids, prefix))
+        found.update(dict.fromkeys(self._match(words, word_ids, prefix)))
+        return list(found)
+
+    def rows(self):
+        """Ингредиенты по id в схеме IngredientSerializer."""
+        return self._get_data()[-1]
+
+    def search(self, prefix):
+        rows = self.rows()
+        return [rows[pk] for pk in self.search_ids(prefix) if pk in rows]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,346 @@
+import json
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Value
+from django.test.utils import CaptureQueriesContext, override_settings
+from recipes.models import (
+    Favorite, Ingredient, IngredientAmount, Recipe, ShoppingCart, Tag,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.serializers import (
+    FollowSerializer, RecipeReadSerializer, RecipeWriteSerializer,
+)
+from api.utils import create_pdf
+from api.views import CustomUserViewSet, RecipeViewSet
+from users.models import Follow
+
+User = get_user_model()
+
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+    'AAAADUlEQVR4nGP4z8DwHwAFAAH/iZk9HQAAAABJRU5ErkJggg=='
+)
+# Кеш замера: после отката транзакции id повторяются, и записи общего
+# кеша (например, фрагменты карточек рецептов) оказались бы чужими.
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versions',
+        'TIMEOUT': None,
+    },
+}
+
+
+def percentile(times, share):
+    return times[min(len(times) - 1, int(share * len(times)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет сериализаторы, выгрузку PDF и основные эндпоинты API '
+        'и сравнивает результат с сохранённым базовым замером'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Сколько раз выполнить каждый замер',
+        )
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Сколько пользователей создать для замеров',
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=200,
+            help='Сколько рецептов создать для замеров',
+        )
+        parser.add_argument(
+            '--only', default='',
+            help='Запускать только замеры, имя которых содержит строку',
+        )
+        parser.add_argument(
+            '--baseline', default='benchmark.json',
+            help='Файл базового замера в формате JSON',
+        )
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Сохранить результат как новый базовый замер',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Допустимое замедление p50 относительно базового замера',
+        )
+
+    @staticmethod
+    def create_fixtures(users_count, recipes_count):
+        """Пользователи, подписки, теги, ингредиенты и рецепты.
+
+        Рецепты создаются по одному, чтобы сработали сигналы: ленты
+        подписчиков и счётчики заполняются так же, как в работе.
+        """
+        users = [
+            User.objects.create(
+                username=f'benchmark-{number}',
+                email=f'benchmark-{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+                password='!',
+            )
+            for number in range(users_count)
+        ]
+        user = users[0]
+        for author in users[1:]:
+            Follow.objects.create(user=user, author=author)
+        tags = [
+            Tag.objects.create(
+                name=f'benchmark-{number}',
+                color=f'#B0B0{number:02X}',
+                slug=f'benchmark-{number}',
+            )
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'benchmark-ингредиент-{number}',
+                measurement_unit='г',
+            )
+            for number in range(50)
+        ]
+        recipes = []
+        for number in range(recipes_count):
+            recipe = Recipe.objects.create(
+                author=users[number % users_count],
+                name=f'Рецепт {number}',
+                text='Нарезать, смешать и запекать до готовности.',
+                image='recipes/benchmark.png',
+                cooking_time=number % 60 + 1,
+            )
+            recipe.tags.set(tags[:number % 3 + 1])
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(
+                    recipe=recipe,
+                    ingredient=ingredients[(number + shift) % 50],
+                    amount=shift + 1,
+                )
+                for shift in range(5)
+            )
+            recipes.append(recipe)
+        for recipe in recipes[:10]:
+            Favorite.objects.create(user=user, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        return user, tags, ingredients, recipes
+
+    def cases(self, user, tags, ingredients, recipes):
+        token = Token.objects.create(user=user)
+        anonymous = APIClient()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        context = {'request': request}
+
+        recipe_page = list(
+            RecipeViewSet(request=request).get_queryset()[:6]
+        )
+        author_page = list(
+            User.objects.filter(following__user=user).annotate(
+                is_subscribed=Value(True)
+            ).order_by('id')[:6]
+        )
+        CustomUserViewSet._prefetch_recipes(author_page, 3)
+        shopping_list = [
+            {
+                'ingredient__name': f'Ингредиент {number}',
+                'ingredient__measurement_unit': 'г',
+                'sum_amount': number,
+            }
+            for number in range(100)
+        ]
+        recipe = recipes[-1]
+        versions = iter(range(10 ** 9))
+
+        def write_data(shift):
+            return {
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': shift + 1}
+                    for ingredient in ingredients[shift:shift + 5]
+                ],
+                'tags': [tag.id for tag in tags[:shift % 3 + 1]],
+                'image': PNG,
+                'name': 'Новый рецепт',
+                'text': 'Смешать всё и подать.',
+                'cooking_time': 10,
+            }
+
+        def create_recipe():
+            serializer = RecipeWriteSerializer(
+                data=write_data(0), context=context
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save(author=user)
+            return serializer.data
+
+        def update_recipe():
+            data = write_data(next(versions) % 2)
+            del data['image']
+            serializer = RecipeWriteSerializer(
+                Recipe.objects.get(pk=recipe.pk), data=data, context=context,
+                partial=True,
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return serializer.data
+
+        def toggle_favorite():
+            url = f'/api/recipes/{recipe.id}/favorite/'
+            return client.post(url), client.delete(url)
+
+        slugs = [tag.slug for tag in tags[1:]]
+        return {
+            'serializer.recipe_read': lambda: RecipeReadSerializer(
+                recipe_page, many=True, context=context
+            ).data,
+            'serializer.follow': lambda: FollowSerializer(
+                author_page, many=True, context=context
+            ).data,
+            'serializer.recipe_create': create_recipe,
+            'serializer.recipe_update': update_recipe,
+            'pdf.create_pdf': lambda: b''.join(create_pdf(shopping_list)),
+            'api.recipes-list': lambda: anonymous.get('/api/recipes/'),
+            'api.recipes-list.auth': lambda: client.get('/api/recipes/'),
+            'api.recipes-list.tags': lambda: client.get(
+                '/api/recipes/', {'tags': slugs}
+            ),
+            'api.recipes-list.search': lambda: client.get(
+                '/api/recipes/', {'search': 'рецепт'}
+            ),
+            'api.recipes-list.cursor': lambda: client.get(
+                '/api/recipes/', {'cursor': ''}
+            ),
+            'api.recipes-detail': lambda: client.get(
+                f'/api/recipes/{recipe.id}/'
+            ),
+            'api.recipes-feed': lambda: client.get('/api/recipes/feed/'),
+            'api.recipes-favorite': toggle_favorite,
+            'api.recipes-download-shopping-cart': lambda: client.get(
+                '/api/recipes/download_shopping_cart/'
+            ),
+            'api.users-list': lambda: client.get('/api/users/'),
+            'api.users-subscriptions': lambda: client.get(
+                '/api/users/subscriptions/', {'recipes_limit': 3}
+            ),
+            'api.ingredients-list': lambda: anonymous.get(
+                '/api/ingredients/', {'name': 'bench'}
+            ),
+            'api.tags-list': lambda: anonymous.get('/api/tags/'),
+        }
+
+    @staticmethod
+    def check_responses(name, result):
+        responses = result if isinstance(result, tuple) else (result,)
+        for response in responses:
+            status_code = getattr(response, 'status_code', 200)
+            if status_code >= 400:
+                raise CommandError(
+                    f'{name}: ответ {status_code} вместо успешного'
+                )
+
+    def measure(self, name, operation, iterations):
+        self.check_responses(name, operation())
+        times = []
+        queries = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                operation()
+                times.append(time.perf_counter() - started)
+            queries = max(queries, len(captured.captured_queries))
+        times.sort()
+        return {
+            'ops_per_sec': round(len(times) / sum(times), 1),
+            'p50_ms': round(percentile(times, 0.5) * 1000, 3),
+            'p99_ms': round(percentile(times, 0.99) * 1000, 3),
+            'queries': queries,
+        }
+
+    def run(self, options):
+        cases = self.cases(*self.create_fixtures(
+            options['users'], options['recipes']
+        ))
+        results = {}
+        for name, operation in cases.items():
+            if options['only'] not in name:
+                continue
+            results[name] = self.measure(
+                name, operation, options['iterations']
+            )
+            self.stdout.write(
+                f'{name}: {results[name]["ops_per_sec"]} оп/с, '
+                f'p50 {results[name]["p50_ms"]} мс, '
+                f'p99 {results[name]["p99_ms"]} мс, '
+                f'запросов {results[name]["queries"]}'
+            )
+        return results
+
+    def compare(self, results, baseline, threshold):
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result['p50_ms'] > base['p50_ms'] * (1 + threshold):
+                regressions.append(
+                    f'{name}: p50 {base["p50_ms"]} → {result["p50_ms"]} мс'
+                )
+            if result['queries'] > base['queries']:
+                regressions.append(
+                    f'{name}: запросов {base["queries"]} → '
+                    f'{result["queries"]}'
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        path = options['baseline']
+        if not options['save'] and not os.path.exists(path):
+            raise CommandError(
+                f'Нет базового замера {path}: сохраните его с --save'
+            )
+        middleware = [
+            item for item in settings.MIDDLEWARE
+            if item != 'api.metrics.MetricsMiddleware'
+        ]
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            ALLOWED_HOSTS=['*'], MIDDLEWARE=middleware, MEDIA_ROOT=media_root,
+            CACHES=CACHES,
+        ):
+            # Все данные замера откатываются вместе с транзакцией.
+            with transaction.atomic():
+                results = self.run(options)
+                transaction.set_rollback(True)
+        if options['save']:
+            with open(path, 'w') as file:
+                json.dump(
+                    {'cases': results}, file, ensure_ascii=False, indent=2
+                )
+            self.stdout.write(self.style.SUCCESS(f'Сохранено в {path}'))
+            return
+        with open(path) as file:
+            baseline = json.load(file)['cases']
+        regressions = self.compare(results, baseline, options['threshold'])
+        if regressions:
+            raise CommandError(
+                'Регрессия производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Без регрессий относительно {path}'
+        ))
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_filters import rest_framework as filters
+from recipes.models import Ingredient
+
+from api.ingredient_index import ingredient_index
+
+
+class StartsWithFilter(filters.FilterSet):
+    name = filters.CharFilter(lookup_expr='istartswith')
+
+    class Meta:
+        model = Ingredient
+        fields = ('name',)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск ингредиентов по индексу в памяти '
+        'с фильтром istartswith в базе данных'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз повторить каждый запрос',
+        )
+
+    @staticmethod
+    def measure(search, prefixes, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for prefix in prefixes:
+                search(prefix)
+        return (time.perf_counter() - started) / (repeat * len(prefixes))
+
+    def handle(self, *args, **options):
+        names = Ingredient.objects.values_list('name', flat=True)[:50]
+        prefixes = [
+            name[:length] for name in names for length in (1, 2, 3, 5)
+        ]
+        if not prefixes:
+            self.stderr.write('Справочник ингредиентов пуст')
+            return
+        ingredient_index.search('')
+        results = {
+            'istartswith': self.measure(
+                lambda prefix: list(StartsWithFilter(
+                    {'name': prefix}, queryset=Ingredient.objects.all()
+                ).qs.values('id', 'name', 'measurement_unit')),
+                prefixes, options['repeat'],
+            ),
+            'индекс': self.measure(
+                ingredient_index.search, prefixes, options['repeat']
+            ),
+        }
+        for title, seconds in results.items():
+            self.stdout.write(
+                f'{title}: {seconds * 1e6:.1f} мкс на запрос'
+            )
+        self.stdout.write(
+            f'Ускорение: '
+            f'{results["istartswith"] / results["индекс"]:.1f}x'
+        )
@@ -0,0 +1,44 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api.utils import create_pdf, register_font
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время и пиковую память при выгрузке списка покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'sizes', nargs='*', type=int, default=[10, 1000, 10000],
+            help='Количество строк в списке покупок',
+        )
+
+    @staticmethod
+    def download(size):
+        data = (
+            {
+                'ingredient__name': f'Ингредиент {number}',
+                'ingredient__measurement_unit': 'г',
+                'sum_amount': number,
+            }
+            for number in range(size)
+        )
+        return sum(len(chunk) for chunk in create_pdf(data))
+
+    def handle(self, *args, **options):
+        register_font()
+        for size in options['sizes']:
+            started = time.perf_counter()
+            body_size = self.download(size)
+            elapsed = time.perf_counter() - started
+            tracemalloc.start()
+            self.download(size)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(
+                f'{size} строк: {elapsed * 1000:.1f} мс, '
+                f'пик памяти {peak / 1024:.0f} КиБ, '
+                f'размер файла {body_size / 1024:.0f} КиБ'
+            )
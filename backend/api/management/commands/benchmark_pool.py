@@ -0,0 +1,88 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+from foodgram.db.pool import pools
+
+ENGINES = {
+    'без пула': 'django.db.backends.postgresql',
+    'с пулом': 'foodgram.db.postgresql',
+}
+
+
+def percentile(times, share):
+    return times[min(len(times) - 1, int(share * len(times)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест соединений с PostgreSQL: каждый «запрос» '
+        'открывает соединение, выполняет SELECT 1 и закрывает его, '
+        'как это делает Django без пула и с пулом'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Число параллельных потоков',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Число запросов в каждом потоке',
+        )
+        parser.add_argument(
+            '--database', default='default',
+            help='Псевдоним базы данных из настроек',
+        )
+
+    @staticmethod
+    def worker(engine, settings_dict, alias, requests, times):
+        wrapper = load_backend(engine).DatabaseWrapper(settings_dict, alias)
+        for _ in range(requests):
+            started = time.perf_counter()
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            # Так Django завершает запрос: с пулом соединение
+            # возвращается в пул, без пула закрывается.
+            wrapper.close_if_unusable_or_obsolete()
+            times.append(time.perf_counter() - started)
+
+    def run(self, engine, settings_dict, alias, options):
+        times = []
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(
+                    engine, settings_dict, alias, options['requests'], times,
+                ),
+            )
+            for _ in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        times.sort()
+        return len(times) / elapsed, times
+
+    def handle(self, *args, **options):
+        settings_dict = connections[options['database']].settings_dict
+        if settings_dict['ENGINE'] not in ENGINES.values():
+            raise CommandError('Нагрузочный тест пула требует PostgreSQL')
+        for title, engine in ENGINES.items():
+            alias = f'benchmark-{engine}'
+            ops, times = self.run(
+                engine, {**settings_dict, 'ENGINE': engine}, alias, options
+            )
+            self.stdout.write(
+                f'{title}: {ops:.0f} запросов/с, '
+                f'p50 {percentile(times, 0.5) * 1000:.2f} мс, '
+                f'p99 {percentile(times, 0.99) * 1000:.2f} мс'
+            )
+        for alias, pool in pools.items():
+            if alias.startswith('benchmark-'):
+                self.stdout.write(f'Статистика пула: {pool.stats()}')
@@ -0,0 +1,133 @@
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from recipes.models import Recipe
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .benchmark import CACHES, Command as Benchmark, percentile
+from api.builders import recipe_cards, recipe_rows
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeReadSerializer
+from api.views import RecipeViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет ускорение карточек рецептов из api.builders с '
+        'FastJSONRenderer относительно RecipeReadSerializer и '
+        'JSONRenderer; побайтное совпадение проверяет '
+        'tests/test_recipe_cards.py'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Сколько раз выполнить каждый замер',
+        )
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Сколько пользователей создать для замеров',
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=200,
+            help='Сколько рецептов создать для замеров',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=50,
+            help='Размер страницы списка рецептов',
+        )
+
+    @staticmethod
+    def prepare(recipes):
+        """Данные, на которых легко разойтись со сериализаторами:
+        копии изображений, рецепт без изображения, \\u2028 в тексте."""
+        for recipe in recipes[::2]:
+            recipe.image_variants = {
+                'source': recipe.image.name,
+                'card': {
+                    'webp': f'recipes/variants/{recipe.id}-card.webp',
+                    'jpeg': f'recipes/variants/{recipe.id}-card.jpg',
+                },
+            }
+            recipe.save(update_fields=('image_variants',))
+        Recipe.objects.filter(id=recipes[-2].id).update(image='')
+        Recipe.objects.filter(id=recipes[-3].id).update(
+            text='Строка\u2028абзац\u2029и «кавычки» 🍲'
+        )
+
+    def measure(self, operation, iterations):
+        body = operation()
+        times = []
+        with CaptureQueriesContext(connection) as captured:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                operation()
+                times.append(time.perf_counter() - started)
+        times.sort()
+        return body, percentile(times, 0.5), (
+            len(captured.captured_queries) // iterations
+        )
+
+    def compare(self, title, user, options):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        view = RecipeViewSet(request=request, action='list', kwargs={})
+        queryset = view.filter_queryset(view.get_queryset())
+        limit = options['limit']
+        context = {'request': request, 'view': view}
+
+        def serializers():
+            return JSONRenderer().render(RecipeReadSerializer(
+                queryset[:limit], many=True, context=context
+            ).data)
+
+        def builders():
+            return FastJSONRenderer().render(
+                recipe_cards(
+                    recipe_rows(queryset, user)[:limit], request
+                )
+            )
+
+        slow, slow_p50, slow_queries = self.measure(
+            serializers, options['iterations']
+        )
+        fast, fast_p50, fast_queries = self.measure(
+            builders, options['iterations']
+        )
+        if slow != fast:
+            raise CommandError(f'{title}: вывод различается')
+        self.stdout.write(
+            f'{title}, {limit} рецептов: сериализаторы '
+            f'{slow_p50 * 1000:.2f} мс ({slow_queries} запросов), '
+            f'builders {fast_p50 * 1000:.2f} мс ({fast_queries} запросов), '
+            f'ускорение в {slow_p50 / fast_p50:.1f} раза'
+        )
+
+    def run(self, options):
+        user, _, _, recipes = Benchmark.create_fixtures(
+            options['users'], options['recipes']
+        )
+        self.prepare(recipes)
+        self.compare('Аноним', AnonymousUser(), options)
+        self.compare('Пользователь', user, options)
+
+    def handle(self, *args, **options):
+        middleware = [
+            item for item in settings.MIDDLEWARE
+            if item != 'api.metrics.MetricsMiddleware'
+        ]
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            ALLOWED_HOSTS=['*'], MIDDLEWARE=middleware, MEDIA_ROOT=media_root,
+            CACHES=CACHES,
+        ):
+            # Все данные замера откатываются вместе с транзакцией.
+            with transaction.atomic():
+                self.run(options)
+                transaction.set_rollback(True)
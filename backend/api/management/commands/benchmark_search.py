@@ -0,0 +1,121 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from recipes.counters import change
+from recipes.models import Recipe
+
+from api.filters import RecipeFilter
+from api.pagination import CustomPagination
+
+User = get_user_model()
+
+WORDS = (
+    'борщ', 'суп', 'салат', 'пирог', 'каша', 'котлеты', 'плов', 'омлет',
+    'блины', 'запеканка', 'рагу', 'паста', 'соус', 'пюре', 'сырники',
+    'курица', 'говядина', 'рыба', 'грибы', 'картофель', 'капуста',
+    'свёкла', 'морковь', 'лук', 'чеснок', 'томаты', 'сыр', 'творог',
+    'молоко', 'яйца', 'мука', 'рис', 'гречка', 'яблоки', 'тыква',
+    'жарить', 'варить', 'запекать', 'тушить', 'мелко', 'нарезать',
+    'посолить', 'поперчить', 'подавать', 'горячим', 'холодным',
+)
+SYLLABLES = (
+    'ба', 'ве', 'го', 'ду', 'жи', 'за', 'ки', 'ло', 'му', 'не', 'по', 'ра',
+    'си', 'ту', 'фе', 'ха', 'це', 'шо', 'ны', 'ля',
+)
+# Словарь с распределением Ципфа: частые кулинарные слова и длинный
+# хвост редких, как в настоящих описаниях рецептов.
+VOCABULARY = WORDS + tuple(
+    first + second + third
+    for first in SYLLABLES for second in SYLLABLES for third in SYLLABLES
+)
+WEIGHTS = tuple(1 / rank for rank in range(1, len(VOCABULARY) + 1))
+QUERIES = ('борщ', 'пирог капуста', 'запекать тыква', 'гречк', 'бавего')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает полнотекстовый поиск рецептов с фильтром icontains; '
+        'при необходимости добавляет синтетические рецепты'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--generate', type=int, default=0,
+            help='Сколько синтетических рецептов добавить перед замером',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Размер пачки при добавлении рецептов',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторить каждый запрос',
+        )
+
+    def generate(self, count, batch_size):
+        """Добавляет рецепты через bulk_create: индекс поиска
+        заполняют триггеры, в ленты подписчиков они не попадают."""
+        author, _ = User.objects.get_or_create(
+            username='benchmark',
+            defaults={'email': 'benchmark@example.com'},
+        )
+        rng = random.Random(0)
+        for start in range(0, count, batch_size):
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=' '.join(
+                        rng.choices(VOCABULARY, WEIGHTS, k=3)
+                    ).capitalize(),
+                    text=' '.join(rng.choices(VOCABULARY, WEIGHTS, k=40)),
+                    image='recipes/benchmark.png',
+                    cooking_time=rng.randint(5, 120),
+                )
+                for _ in range(min(batch_size, count - start))
+            )
+            self.stdout.write(f'Добавлено {min(start + batch_size, count)}')
+        change(User, author.id, 'recipes_count', count)
+
+    @staticmethod
+    def measure(queryset, repeat):
+        """Время выдачи первой страницы вместе с общим числом
+        найденных рецептов, как в ответе списка рецептов."""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            count = queryset.count()
+            list(queryset.values_list('id', flat=True)[
+                :CustomPagination.page_size
+            ])
+        return (time.perf_counter() - started) / repeat, count
+
+    def handle(self, *args, **options):
+        if options['generate']:
+            self.generate(options['generate'], options['batch_size'])
+        self.stdout.write(f'Рецептов в базе: {Recipe.objects.count()}')
+        totals = {'icontains': 0, 'search': 0}
+        for query in QUERIES:
+            icontains, found = self.measure(
+                Recipe.objects.filter(
+                    Q(name__icontains=query) | Q(text__icontains=query)
+                ).order_by('-pub_date', '-id'),
+                options['repeat'],
+            )
+            search, matched = self.measure(
+                RecipeFilter(
+                    {'search': query}, queryset=Recipe.objects.all()
+                ).qs,
+                options['repeat'],
+            )
+            totals['icontains'] += icontains
+            totals['search'] += search
+            self.stdout.write(
+                f'«{query}»: icontains {icontains * 1000:.1f} мс '
+                f'({found} шт.), поиск {search * 1000:.1f} мс '
+                f'({matched} шт.)'
+            )
+        self.stdout.write(
+            f'Ускорение: {totals["icontains"] / totals["search"]:.1f}x'
+        )
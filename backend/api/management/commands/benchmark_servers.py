@@ -0,0 +1,194 @@
+import asyncio
+import os
+import socket
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Ingredient, Recipe
+
+SERVERS = {
+    'WSGI': ('foodgram.wsgi:application', [], 'False'),
+    'ASGI': (
+        'foodgram.asgi:application',
+        ['--worker-class', 'uvicorn.workers.UvicornWorker'],
+        'True',
+    ),
+}
+
+
+def percentile(times, share):
+    return times[min(len(times) - 1, int(share * len(times)))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность API под gunicorn с '
+        'синхронными воркерами (WSGI) и с воркерами uvicorn (ASGI) '
+        'при большом числе одновременных клиентов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=100,
+            help='Число одновременных клиентов',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность нагрузки на каждый адрес, с',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Число воркеров gunicorn',
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help=(
+                'Число медленных клиентов, которые передают запрос '
+                'по байту, пока идёт замер'
+            ),
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Адрес для нагрузки; по умолчанию горячие адреса чтения',
+        )
+
+    @staticmethod
+    def default_paths():
+        paths = ['/api/recipes/', '/api/tags/']
+        recipe = Recipe.objects.order_by('id').first()
+        if recipe:
+            paths.append(f'/api/recipes/{recipe.id}/')
+        ingredient = Ingredient.objects.order_by('id').first()
+        if ingredient:
+            paths.append(f'/api/ingredients/?name={ingredient.name[:2]}')
+        return paths
+
+    def start_server(self, app, arguments, async_views, port, workers):
+        environment = {**os.environ, 'ASYNC_VIEWS': async_views}
+        server = subprocess.Popen(
+            [
+                'gunicorn', app,
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(workers),
+                '--log-level', 'warning',
+                *arguments,
+            ],
+            cwd=settings.BASE_DIR, env=environment,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Сервер {app} не запустился')
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'Сервер {app} не ответил за 30 с')
+
+    @staticmethod
+    async def request(port, path):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+                'Connection: close\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        return int(response.split(b' ', 2)[1])
+
+    @staticmethod
+    async def slow_client(port, path, deadline):
+        """Медленный клиент: держит соединение, передавая запрос по
+        байту в секунду."""
+        message = f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n'.encode()
+        while time.monotonic() < deadline:
+            try:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port
+                )
+            except OSError:
+                await asyncio.sleep(1)
+                continue
+            try:
+                for byte in message:
+                    if time.monotonic() >= deadline:
+                        break
+                    writer.write(bytes((byte,)))
+                    await writer.drain()
+                    await asyncio.sleep(1)
+            except OSError:
+                pass
+            finally:
+                writer.close()
+
+    async def client(self, port, path, deadline, times, errors):
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await self.request(port, path)
+            except (OSError, IndexError, ValueError):
+                status = None
+            if status is None or status >= 400:
+                errors.append(status)
+            else:
+                times.append(time.perf_counter() - started)
+
+    async def load(self, port, path, options):
+        times = []
+        errors = []
+        deadline = time.monotonic() + options['duration']
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                self.slow_client(port, path, deadline)
+                for _ in range(options['slow_clients'])
+            ),
+            *(
+                self.client(port, path, deadline, times, errors)
+                for _ in range(options['concurrency'])
+            ),
+        )
+        elapsed = time.perf_counter() - started
+        times.sort()
+        return len(times) / elapsed, times, errors
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.default_paths()
+        for title, (app, arguments, async_views) in SERVERS.items():
+            port = free_port()
+            server = self.start_server(
+                app, arguments, async_views, port, options['workers']
+            )
+            try:
+                for path in paths:
+                    ops, times, errors = asyncio.run(
+                        self.load(port, path, options)
+                    )
+                    if not times:
+                        self.stdout.write(
+                            f'{title} {path}: нет успешных ответов, '
+                            f'ошибок {len(errors)}'
+                        )
+                        continue
+                    self.stdout.write(
+                        f'{title} {path}: {ops:.0f} запросов/с, '
+                        f'p50 {percentile(times, 0.5) * 1000:.1f} мс, '
+                        f'p99 {percentile(times, 0.99) * 1000:.1f} мс, '
+                        f'ошибок {len(errors)}'
+                    )
+            finally:
+                server.terminate()
+                server.wait()
@@ -0,0 +1,456 @@
+"""Метрики производительности по маршрутам API в формате Prometheus.
+
+Каждый воркер копит гистограммы в памяти и раз в METRICS_FLUSH_INTERVAL
+секунд сохраняет их в свой файл в METRICS_DIR, даже без запросов.
+Эндпоинт метрик суммирует файлы всех воркеров, поэтому ответ не зависит
+от того, какой воркер gunicorn его обработал.
+
+Счётчики Prometheus не должны уменьшаться, поэтому при выходе воркер
+переносит свои счётчики и гистограммы в общий файл retired.json и
+удаляет свой файл. Файл, который не обновлялся дольше
+METRICS_STALE_AFTER секунд, принадлежит аварийно завершившемуся
+воркеру и переносится так же. Показания (gauge) при переносе
+отбрасываются: они имеют смысл только у живых процессов.
+"""
+import asyncio
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+from foodgram.db.pool import pools
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+METRICS = {
+    'foodgram_request_duration_seconds': (
+        'histogram', 'Время обработки запроса', DURATION_BUCKETS,
+    ),
+    'foodgram_sql_queries': (
+        'histogram', 'Число SQL-запросов за запрос', QUERY_BUCKETS,
+    ),
+    'foodgram_sql_duration_seconds': (
+        'histogram', 'Время SQL-запросов за запрос', DURATION_BUCKETS,
+    ),
+    'foodgram_serializer_duration_seconds': (
+        'histogram',
+        'Время serializer.data в list, retrieve и действиях чтения, '
+        'включая запросы самих сериализаторов',
+        DURATION_BUCKETS,
+    ),
+    'foodgram_render_duration_seconds': (
+        'histogram', 'Время кодирования ответа в JSON', DURATION_BUCKETS,
+    ),
+    'foodgram_responses_total': (
+        'counter', 'Число ответов по кодам статуса', None,
+    ),
+    'foodgram_token_cache_total': (
+        'counter', 'Проверки токенов по источнику: local, shared, miss',
+        None,
+    ),
+    'foodgram_db_pool_connections': (
+        'gauge', 'Соединения в пулах живых воркеров по состоянию', None,
+    ),
+    'foodgram_db_pool_max_size': (
+        'gauge', 'Суммарный предел соединений в пулах живых воркеров', None,
+    ),
+    'foodgram_db_pool_waits_total': (
+        'counter', 'Сколько раз запрос ждал свободное соединение', None,
+    ),
+    'foodgram_db_pool_wait_seconds_total': (
+        'counter', 'Суммарное время ожидания соединения', None,
+    ),
+    'foodgram_db_pool_timeouts_total': (
+        'counter', 'Сколько раз соединение не дождались', None,
+    ),
+    'foodgram_db_pool_opened_total': (
+        'counter', 'Открыто соединений с базой данных', None,
+    ),
+    'foodgram_db_pool_recycled_total': (
+        'counter', 'Закрыто неисправных и устаревших соединений', None,
+    ),
+}
+POOL_METRICS = (
+    ('foodgram_db_pool_max_size', 'max_size'),
+    ('foodgram_db_pool_waits_total', 'waits'),
+    ('foodgram_db_pool_wait_seconds_total', 'wait_seconds'),
+    ('foodgram_db_pool_timeouts_total', 'timeouts'),
+    ('foodgram_db_pool_opened_total', 'opened'),
+    ('foodgram_db_pool_recycled_total', 'recycled'),
+)
+RETIRED = 'retired.json'
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def format_labels(labels, **extra):
+    pairs = (*labels, *extra.items())
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in pairs
+    ) + '}'
+
+
+class Registry:
+    """Гистограммы и счётчики одного процесса.
+
+    Для гистограммы хранится список числа наблюдений по корзинам
+    (последняя — +Inf) и сумма значений, для счётчика — одно число.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._values = {}
+        self._path = None
+        self._flushed = 0
+        self._written = False
+        self._closed = False
+
+    def _check_process(self):
+        # После fork потомок получает копию чужих значений: начинаем
+        # с нуля и пишем в свой файл.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._values = {}
+            self._path = os.path.join(
+                settings.METRICS_DIR, f'worker-{uuid.uuid4().hex}.json'
+            )
+            self._flushed = time.monotonic()
+            self._written = False
+            self._closed = False
+            threading.Thread(
+                target=self._heartbeat, name='metrics-heartbeat',
+                daemon=True,
+            ).start()
+
+    def _heartbeat(self):
+        # Файл живого воркера обновляется и без запросов: по времени
+        # изменения файла видно, что воркер жив.
+        while not self._closed:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush(force=True)
+            except OSError:
+                pass
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self._lock:
+            self._check_process()
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(buckets) + 2)
+            row[bisect_left(buckets, value)] += 1
+            row[-1] += value
+
+    def increment(self, name, labels):
+        key = (name, labels)
+        with self._lock:
+            self._check_process()
+            self._values[key] = self._values.get(key, 0) + 1
+
+    def collect_pools(self):
+        """Переносит текущую статистику пулов соединений процесса."""
+        for alias, pool in pools.items():
+            stats = pool.stats()
+            labels = (('alias', alias),)
+            for state in ('idle', 'in_use'):
+                self._values[(
+                    'foodgram_db_pool_connections',
+                    (*labels, ('state', state)),
+                )] = stats[state]
+            for name, field in POOL_METRICS:
+                self._values[(name, labels)] = stats[field]
+
+    def flush(self, force=False):
+        with self._lock:
+            self._check_process()
+            if self._closed or not force and (
+                time.monotonic() - self._flushed
+                < settings.METRICS_FLUSH_INTERVAL
+            ):
+                return
+            if self._written and not os.path.exists(self._path):
+                # Файл сочли брошенным и уже перенесли в retired.json:
+                # перенесённые значения не должны учитываться дважды.
+                self._values = {}
+            self._flushed = time.monotonic()
+            self.collect_pools()
+            self.write(self._path, [
+                [name, labels, value]
+                for (name, labels), value in self._values.items()
+            ])
+            self._written = True
+
+    def close(self):
+        """Переносит значения завершающегося воркера в retired.json."""
+        self.flush(force=True)
+        with self._lock:
+            self._closed = True
+        with self.locked():
+            self.retire([self._path])
+
+    @staticmethod
+    def write(path, rows):
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(rows, file)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def read(path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return []
+
+    @staticmethod
+    def add(totals, rows, gauges=True):
+        for name, labels, value in rows:
+            if name not in METRICS or (
+                METRICS[name][0] == 'gauge' and not gauges
+            ):
+                continue
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if isinstance(value, list):
+                total = totals.setdefault(key, [0] * len(value))
+                for index, item in enumerate(value):
+                    total[index] += item
+            else:
+                totals[key] = totals.get(key, 0) + value
+
+    @staticmethod
+    @contextmanager
+    def locked():
+        """Блокировка каталога метрик на время переноса файлов."""
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        with open(os.path.join(settings.METRICS_DIR, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def retire(self, paths):
+        """Добавляет счётчики и гистограммы из файлов paths к
+        retired.json и удаляет эти файлы. Вызывается под блокировкой."""
+        retired = os.path.join(settings.METRICS_DIR, RETIRED)
+        totals = {}
+        self.add(totals, self.read(retired))
+        for path in paths:
+            self.add(totals, self.read(path), gauges=False)
+        self.write(retired, [
+            [name, labels, value] for (name, labels), value in totals.items()
+        ])
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def stale(path):
+        try:
+            modified = os.path.getmtime(path)
+        except FileNotFoundError:
+            return False
+        return time.time() - modified > settings.METRICS_STALE_AFTER
+
+    def load(self):
+        """Суммирует значения из retired.json и файлов живых воркеров."""
+        with self.locked():
+            paths = glob.glob(
+                os.path.join(settings.METRICS_DIR, 'worker-*.json')
+            )
+            stale = [path for path in paths if self.stale(path)]
+            if stale:
+                self.retire(stale)
+            totals = {}
+            self.add(
+                totals, self.read(os.path.join(settings.METRICS_DIR, RETIRED))
+            )
+            for path in paths:
+                if path not in stale:
+                    self.add(totals, self.read(path))
+        return totals
+
+    def collect(self):
+        """Возвращает метрики всех воркеров в текстовом формате
+        Prometheus."""
+        self.flush(force=True)
+        totals = self.load()
+        lines = []
+        for name, (kind, description, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, labels), value in sorted(totals.items()):
+                if metric != name:
+                    continue
+                if buckets is None:
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bucket, count in zip((*buckets, '+Inf'), value):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket'
+                        f'{format_labels(labels, le=bucket)} {cumulative}'
+                    )
+                lines.append(f'{name}_sum{format_labels(labels)} {value[-1]}')
+                lines.append(
+                    f'{name}_count{format_labels(labels)} {cumulative}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+@atexit.register
+def close_on_exit():
+    if registry._pid == os.getpid():
+        registry.close()
+
+
+class QueryStats:
+    """Обёртка execute: считает SQL-запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+_query_stats = ContextVar('query_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    queries = _query_stats.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    return queries(execute, sql, params, many, context)
+
+
+@contextmanager
+def serializer_timer(request):
+    """Добавляет время блока к времени сериализации запроса."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        # Время хранится в HttpRequest: его читает MetricsMiddleware.
+        request = getattr(request, '_request', request)
+        request.serializer_duration = getattr(
+            request, 'serializer_duration', 0
+        ) + time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_stats(sender, connection, **kwargs):
+    """Запросы учитываются на любом соединении, в том числе открытом
+    в потоке асинхронного представления: статистика текущего запроса
+    берётся из контекста."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Записывает время запроса, число и время SQL-запросов, время
+    сериализации (serializer_timer) и рендеринга ответа с метками
+    маршрута (url_name) и метода.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        queries = QueryStats()
+        request.serializer_duration = 0
+        request.render_duration = 0
+        started = time.perf_counter()
+        token = _query_stats.set(queries)
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        self.record(request, response, queries, started)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryStats()
+        request.serializer_duration = 0
+        request.render_duration = 0
+        started = time.perf_counter()
+        token = _query_stats.set(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        self.record(request, response, queries, started)
+        return response
+
+    @staticmethod
+    def record(request, response, queries, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        labels = (
+            ('route', match.url_name if match else 'unmatched'),
+            ('method', request.method),
+        )
+        registry.observe('foodgram_request_duration_seconds', labels, duration)
+        registry.observe('foodgram_sql_queries', labels, queries.count)
+        registry.observe(
+            'foodgram_sql_duration_seconds', labels, queries.duration
+        )
+        registry.observe(
+            'foodgram_serializer_duration_seconds', labels,
+            request.serializer_duration,
+        )
+        registry.observe(
+            'foodgram_render_duration_seconds', labels,
+            request.render_duration,
+        )
+        registry.increment(
+            'foodgram_responses_total',
+            (*labels, ('status', str(response.status_code))),
+        )
+        registry.flush()
+
+    def process_template_response(self, request, response):
+        if response.is_rendered:
+            # Асинхронное представление рендерит ответ в своём потоке
+            # и само записывает время рендеринга.
+            return response
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.render_duration = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
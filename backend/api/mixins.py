@@ -0,0 +1,120 @@
+import gzip
+import io
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from foodgram.replicas import primary_reads
+from recipes.versions import get_version
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .metrics import serializer_timer
+
+
+class SerializerTimingMixin:
+    """Замеряет время serializer.data для метрик сериализации.
+
+    Действия чтения, которые сериализуют данные сами, вызывают
+    serialize() вместо serializer.data.
+    """
+
+    def serialize(self, serializer):
+        with serializer_timer(self.request):
+            return serializer.data
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                self.serialize(self.get_serializer(page, many=True))
+            )
+        return Response(
+            self.serialize(self.get_serializer(queryset, many=True))
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialize(self.get_serializer(
+            self.get_object()
+        )))
+
+
+class SnapshotListMixin(SerializerTimingMixin):
+    """Отдаёт список справочника заранее закодированным JSON.
+
+    Снимок строится один раз на версию справочника snapshot_name и
+    хранится в памяти процесса вместе со сжатой gzip копией. Клиенты
+    получают строгий ETag и ответ 304, если данные не менялись.
+    """
+    snapshot_name = None
+    snapshot_gzip_min_size = 1024
+    _snapshots = {}
+
+    @staticmethod
+    def compress(body):
+        buffer = io.BytesIO()
+        with gzip.GzipFile(
+            fileobj=buffer, mode='wb', compresslevel=9, mtime=0
+        ) as file:
+            file.write(body)
+        return buffer.getvalue()
+
+    def get_snapshot(self):
+        version = get_version(self.snapshot_name)
+        snapshot = self._snapshots.get(self.snapshot_name)
+        if snapshot is None or snapshot[0] != version:
+            with primary_reads():
+                serializer = self.get_serializer(
+                    self.filter_queryset(self.get_queryset()), many=True
+                )
+                body = JSONRenderer().render(self.serialize(serializer))
+            compressed = (
+                self.compress(body)
+                if len(body) >= self.snapshot_gzip_min_size else None
+            )
+            snapshot = (version, body, compressed)
+            self._snapshots[self.snapshot_name] = snapshot
+        return snapshot
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        version, body, compressed = self.get_snapshot()
+        use_gzip = compressed is not None and 'gzip' in request.META.get(
+            'HTTP_ACCEPT_ENCODING', ''
+        )
+        etag = f'"{self.snapshot_name}-{version}{"-gz" if use_gzip else ""}"'
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                compressed if use_gzip else body,
+                content_type='application/json',
+            )
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class CursorPaginationMixin:
+    """Включает курсорную пагинацию, если в запросе есть параметр cursor.
+
+    Без параметра используется обычная pagination_class, так что режим
+    остаётся совместимым с текущим фронтендом.
+    """
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.cursor_pagination_class
+            if pagination_class is not None and (
+                pagination_class.cursor_query_param
+                in self.request.query_params
+            ):
+                self._paginator = pagination_class()
+                return self._paginator
+        return super().paginator
@@ -1,20 +1,44 @@
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
-from django.db import transaction
-from django.shortcuts import get_object_or_404
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import (
+    Exists, OuterRef, Prefetch, Value, prefetch_related_objects,
+)
+from django.db.models.deletion import Collector
+from django.urls import reverse
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from foodgram.replicas import primary_reads
 from recipes.models import (
-    Favorite, Ingredient, IngredientAmount, Recipe, ShoppingCart, Tag,
+    Favorite, Ingredient, IngredientAmount, Recipe, ShoppingCart,
+    ShoppingListExport, ShoppingListItem, Tag,
 )
 from rest_framework import serializers
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.fields import IntegerField, SerializerMethodField
-from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.serializers import ModelSerializer
 
+from .builders import fragment_keys, image_variant_urls
 from users.models import Follow, User
 
 
+def subscribed_ids(context):
+    """Авторы, на которых подписан пользователь запроса.
+
+    Загружаются одним запросом и запоминаются в контексте: он общий для
+    всех элементов списка и вложенных сериализаторов.
+    """
+    if 'subscribed_ids' not in context:
+        user = context['request'].user
+        context['subscribed_ids'] = set(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        ) if user.is_authenticated else set()
+    return context['subscribed_ids']
+
+
 class CustomUserCreateSerializer(UserCreateSerializer):
     class Meta:
         model = User
@@ -41,11 +65,9 @@ class CustomUserSerializer(UserSerializer):
         }
 
     def is_subscribed_user(self, obj):
-        user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and obj.following.filter(user=user).exists()
-        )
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in subscribed_ids(self.context)
 
     def create(self, validated_data):
         validated_data['password'] = (
@@ -56,27 +78,22 @@ class CustomUserSerializer(UserSerializer):
 
 class FollowSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name',
-                  'last_name', 'is_subscribed', 'recipes', 'recipes_count')
+                  'last_name', 'is_subscribed', 'recipes', 'recipes_count',
+                  'followers_count')
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return (
-            request.user.is_authenticated and Follow.objects.filter(
-                user=request.user,
-                author=obj
-            ).exists()
-        )
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author__id=obj.id).count()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in subscribed_ids(self.context)
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'limited_recipes'):
+            return PlainRecipeSerializer(obj.limited_recipes, many=True).data
         request = self.context.get('request')
         recipes_limit = request.GET.get('recipes_limit')
         queryset = Recipe.objects.filter(
@@ -165,6 +182,90 @@ class IngredientInRecipeWriteSerializer(ModelSerializer):
         fields = ('id', 'amount')
 
 
+def recipe_prefetches(user):
+    """Связи рецепта, которые читает RecipeReadSerializer."""
+    authors = User.objects.all()
+    if user.is_anonymous:
+        authors = authors.annotate(is_subscribed=Value(False))
+    else:
+        authors = authors.annotate(is_subscribed=Exists(
+            Follow.objects.filter(user=user, author=OuterRef('pk'))
+        ))
+    return (
+        'tags',
+        Prefetch(
+            'amounts',
+            queryset=IngredientAmount.objects.select_related(
+                'ingredient'
+            ).order_by('id'),
+        ),
+        Prefetch('author', queryset=authors),
+    )
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список карточек рецептов с кешем фрагментов.
+
+    Общая для всех пользователей часть карточки хранится в кеше под
+    теми же ключами, что и в api.builders, и читается одним get_many.
+    Связи загружаются и сериализуются только для рецептов, которых нет
+    в кеше; поля пользователя накладываются поверх фрагмента.
+    """
+
+    def to_representation(self, data):
+        recipes = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        if not recipes or request is None:
+            return super().to_representation(recipes)
+        if not settings.RECIPE_CARD_CACHE:
+            prefetch_related_objects(recipes, *recipe_prefetches(request.user))
+            return super().to_representation(recipes)
+        keys = fragment_keys([
+            {'id': recipe.id, 'author_id': recipe.author_id}
+            for recipe in recipes
+        ], request)
+        cached = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.id] not in cached
+        ]
+        with primary_reads():
+            prefetch_related_objects(
+                missing, *recipe_prefetches(request.user)
+            )
+        built = {
+            recipe.id: self.child.to_representation(recipe)
+            for recipe in missing
+        }
+        cache.set_many({
+            keys[pk]: {
+                **card,
+                'author': {**card['author'], 'is_subscribed': False},
+                'is_favorited': False,
+                'is_in_shopping_cart': False,
+            }
+            for pk, card in built.items()
+        }, settings.RECIPE_CARD_CACHE_TTL)
+        return [
+            built.get(recipe.id) or self.overlay(
+                cached[keys[recipe.id]], recipe
+            )
+            for recipe in recipes
+        ]
+
+    def overlay(self, fragment, recipe):
+        return {
+            **fragment,
+            'author': {
+                **fragment['author'],
+                'is_subscribed': (
+                    recipe.author_id in subscribed_ids(self.context)
+                ),
+            },
+            'is_favorited': self.child.get_is_favorited(recipe),
+            'is_in_shopping_cart': self.child.get_is_in_shopping_cart(recipe),
+        }
+
+
 class RecipeReadSerializer(ModelSerializer):
     image = Base64ImageField()
     is_favorited = serializers.SerializerMethodField(read_only=True)
@@ -175,6 +276,7 @@ class RecipeReadSerializer(ModelSerializer):
         many=True
     )
     author = CustomUserSerializer()
+    image_variants = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -187,17 +289,30 @@ class RecipeReadSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
+        list_serializer_class = RecipeListSerializer
+
+    def get_image_variants(self, obj):
+        request = self.context.get('request')
+        return image_variant_urls(
+            obj.image.name, obj.image_variants,
+            request.build_absolute_uri if request else (lambda url: url),
+        )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return user.favorites_user.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -205,8 +320,7 @@ class RecipeReadSerializer(ModelSerializer):
 
 
 class RecipeWriteSerializer(ModelSerializer):
-    tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                  many=True)
+    tags = serializers.ListField(child=IntegerField())
     author = UserSerializer(read_only=True)
     ingredients = IngredientInRecipeWriteSerializer(many=True)
     image = Base64ImageField(max_length=None, use_url=False,)
@@ -230,45 +344,97 @@ class RecipeWriteSerializer(ModelSerializer):
             raise ValidationError({
                 'ingredients': 'Нужен хотя бы один ингредиент!'
             })
-        ingredients_list = []
-        for item in ingredients:
-            ingredient = get_object_or_404(Ingredient, id=item['id'])
-            if ingredient in ingredients_list:
-                raise ValidationError({
-                    'ingredients': 'Ингридиенты не могут повторяться!'
-                })
-            if int(item['amount']) <= 0:
-                raise ValidationError({
-                    'amount': 'Количество ингредиента должно быть больше 0!'
-                })
-            ingredients_list.append(ingredient)
+        ids = [item['id'] for item in ingredients]
+        if len(set(ids)) != len(ids):
+            raise ValidationError({
+                'ingredients': 'Ингридиенты не могут повторяться!'
+            })
+        if any(int(item['amount']) <= 0 for item in ingredients):
+            raise ValidationError({
+                'amount': 'Количество ингредиента должно быть больше 0!'
+            })
+        if len(Ingredient.objects.in_bulk(ids)) != len(ids):
+            raise NotFound({
+                'ingredients': 'Ингредиент не найден!'
+            })
         return value
 
     def validate_tags(self, value):
-        tags = value
-        if not tags:
+        if not value:
             raise ValidationError({
                 'tags': 'Нужно выбрать хотя бы один тег!'
             })
-        tags_list = []
-        for tag in tags:
-            if tag in tags_list:
-                raise ValidationError({
-                    'tags': 'Теги должны быть уникальными!'
-                })
-            tags_list.append(tag)
-        return value
+        if len(set(value)) != len(value):
+            raise ValidationError({
+                'tags': 'Теги должны быть уникальными!'
+            })
+        tags = Tag.objects.in_bulk(value)
+        if len(tags) != len(value):
+            raise ValidationError({
+                'tags': 'Тег не найден!'
+            })
+        return [tags[tag_id] for tag_id in value]
 
-    @transaction.atomic
     def create_ingredients_amounts(self, ingredients, recipe):
         IngredientAmount.objects.bulk_create(
             [IngredientAmount(
-                ingredient=Ingredient.objects.get(id=ingredient['id']),
+                ingredient_id=ingredient['id'],
                 recipe=recipe,
                 amount=ingredient['amount']
             ) for ingredient in ingredients]
         )
 
+    def update_ingredients_amounts(self, ingredients, recipe):
+        """Приводит количества ингредиентов рецепта к ingredients.
+
+        Меняет только отличающиеся строки. Текущие строки берутся из
+        prefetch рецепта (get_queryset представления), лишние удаляются
+        по этим же объектам без повторного чтения. Изменения количеств,
+        включая удалённые строки, возвращаются для списков покупок одним
+        словарём: bulk_update и bulk_create не отправляют сигналов, а
+        удалённые строки помечаются, чтобы их не вычитал post_delete.
+
+        Вызывается внутри транзакции update().
+        """
+        current = {
+            amount.ingredient_id: amount for amount in recipe.amounts.all()
+        }
+        new = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        changes = {}
+        to_update = []
+        for ingredient_id, amount in current.items():
+            new_amount = new.get(ingredient_id, 0)
+            if new_amount and new_amount != amount.amount:
+                changes[ingredient_id] = new_amount - amount.amount
+                amount.amount = new_amount
+                to_update.append(amount)
+        to_delete = [
+            amount for ingredient_id, amount in current.items()
+            if ingredient_id not in new
+        ]
+        for amount in to_delete:
+            changes[amount.ingredient_id] = -amount.amount
+            amount.shopping_list_applied = True
+        to_create = [
+            {'id': ingredient_id, 'amount': amount}
+            for ingredient_id, amount in new.items()
+            if ingredient_id not in current
+        ]
+        for ingredient in to_create:
+            changes[ingredient['id']] = ingredient['amount']
+        if to_delete:
+            collector = Collector(using=router.db_for_write(IngredientAmount))
+            collector.collect(to_delete)
+            collector.delete()
+        if to_update:
+            IngredientAmount.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            self.create_ingredients_amounts(to_create, recipe)
+        return changes
+
     @transaction.atomic
     def create(self, validated_data):
         image = validated_data.pop('image')
@@ -282,20 +448,33 @@ class RecipeWriteSerializer(ModelSerializer):
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
         instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients_amounts(recipe=instance,
-                                        ingredients=ingredients)
-        instance.save()
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            changes = self.update_ingredients_amounts(
+                recipe=instance, ingredients=ingredients
+            )
+            if changes:
+                ShoppingListItem.objects.apply(
+                    instance.shopping_cart.values_list('user_id', flat=True),
+                    changes,
+                )
         return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'amounts',
+                queryset=IngredientAmount.objects.select_related('ingredient')
+            ),
+        )
         return RecipeReadSerializer(instance,
                                     context=context).data
 
@@ -315,3 +494,27 @@ class PlainRecipeSerializer(serializers.ModelSerializer):
                 'errors': 'Рецепт уже добавлен в список покупок.'
             })
         return data
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS,
+    )
+
+
+class ShoppingListExportSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ShoppingListExport
+        fields = ('id', 'status', 'created', 'finished', 'download_url')
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != ShoppingListExport.DONE:
+            return None
+        return self.context['request'].build_absolute_uri(
+            reverse('api:shopping_cart_exports-download', args=(obj.id,))
+        )
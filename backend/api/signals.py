@@ -0,0 +1,25 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.versions import bump_version
+from rest_framework.authtoken.models import Token
+
+from .authentication import USER_VERSION, shared_key
+from users.models import User
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    bump_version(USER_VERSION.format(instance.user_id))
+    # Ключ токена — его первичный ключ: после удаления он уже None.
+    key = shared_key(instance.key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, update_fields, **kwargs):
+    # Вход обновляет только last_login: кеш токенов остаётся верным.
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_version(USER_VERSION.format(instance.id))
@@ -1,20 +1,39 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .asynchronous import asynchronous_urls
 from .views import (
-    CustomUserViewSet, IngredientViewSet, RecipeViewSet, TagViewSet,
+    CustomUserViewSet, IngredientViewSet, MetricsView, RecipeViewSet,
+    ShoppingListExportViewSet, TagViewSet,
 )
 
 app_name = 'api'
 
+# Частые запросы чтения, которые под ASGI выполняются в пуле потоков
+# api.asynchronous. Обёртка выбирается по маршруту, а не по методу:
+# запись в рецепт через recipes-detail тоже идёт через пул.
+ASYNC_ROUTES = {
+    'recipes-list', 'recipes-detail', 'ingredients-list', 'tags-list',
+    'tags-detail',
+}
+
 router_v1 = DefaultRouter()
 router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
 router_v1.register('users', CustomUserViewSet, basename='users')
+router_v1.register(
+    'shopping_cart_exports', ShoppingListExportViewSet,
+    basename='shopping_cart_exports'
+)
 
-urlpatterns = (
+urlpatterns = [
     path('', include(router_v1.urls)),
     path('auth/', include('djoser.urls.authtoken')),
     path('auth/', include('djoser.urls')),
-)
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = asynchronous_urls(urlpatterns, ASYNC_ROUTES)
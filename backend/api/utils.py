@@ -1,36 +1,78 @@
-import io
+import functools
+import os
+import tempfile
 
 from django.conf import settings
 from django.http import FileResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 
+FONT_NAME = 'Ubuntu'
+FONT_PATH = os.path.join(os.path.dirname(__file__), 'fonts', 'Ubuntu-C.ttf')
+FONT_SIZE = 15
+LINE_HEIGHT = 18
+MARGIN = 50
 
-def create_pdf(data):
-    shoping_list = []
-    shoping_list.append('СПИСОК ПОКУПОК:')
-    shoping_list.append('---------')
+
+@functools.lru_cache(maxsize=None)
+def register_font():
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+    return FONT_NAME
+
+
+def shopping_list_lines(data):
+    yield 'СПИСОК ПОКУПОК:'
+    yield '---------'
     for item in data:
-        shoping_list.append(
+        yield (
             f"{item['ingredient__name']} – "
             f"{item['sum_amount']}"
             f"({item['ingredient__measurement_unit']})"
         )
-    pdfmetrics.registerFont(TTFont('Ubuntu', './api/fonts/Ubuntu-C.ttf'))
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer)
-    font_size = 15
-    p.setFont('Ubuntu', font_size)
-    start_x = 50
-    start_y = 800
-    for string_line in shoping_list:
-        p.drawString(start_x, start_y, string_line)
-        start_y -= 15
+
+
+def render_pdf(lines, output):
+    """Пишет строки в PDF постранично.
+
+    Страница сбрасывается в документ, как только заполнена, поэтому
+    число строк не ограничено одной страницей.
+    """
+    font_name = register_font()
+    width, height = A4
+    max_width = width - 2 * MARGIN
+    p = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+    p.setFont(font_name, FONT_SIZE)
+    y = height - MARGIN
+    for line in lines:
+        parts = (
+            simpleSplit(line, font_name, FONT_SIZE, max_width)
+            if p.stringWidth(line, font_name, FONT_SIZE) > max_width
+            else (line,)
+        )
+        for part in parts:
+            if y < MARGIN:
+                p.showPage()
+                p.setFont(font_name, FONT_SIZE)
+                y = height - MARGIN
+            p.drawString(MARGIN, y, part)
+            y -= LINE_HEIGHT
     p.showPage()
     p.save()
+
+
+def create_pdf(data):
+    buffer = tempfile.SpooledTemporaryFile(
+        max_size=settings.SHOPPING_LIST_SPOOL_SIZE
+    )
+    render_pdf(shopping_list_lines(data), buffer)
+    size = buffer.tell()
     buffer.seek(0)
-    return FileResponse(
+    response = FileResponse(
         buffer, as_attachment=True,
         filename=settings.SHOPPING_LIST_FILE_NAME
     )
+    response['Content-Length'] = size
+    return response
@@ -1,35 +1,61 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Value, Window
+from django.db.models.functions import RowNumber
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from recipes.models import (
-    Favorite, Ingredient, IngredientAmount, Recipe, ShoppingCart, Tag,
+    Favorite, FeedEntry, Ingredient, Recipe, ShoppingCart, ShoppingListExport,
+    ShoppingListItem, Tag,
 )
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin
+from rest_framework.permissions import (
+    SAFE_METHODS, IsAdminUser, IsAuthenticated,
+)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.views import APIView
+from rest_framework.viewsets import (
+    GenericViewSet, ModelViewSet, ReadOnlyModelViewSet,
+)
 
+from .builders import recipe_cards, recipe_rows
+from .bulk import bulk_links
+from .exports import start_export
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from .ingredient_index import ingredient_index
+from .metrics import registry, serializer_timer
+from .mixins import (
+    CursorPaginationMixin, SerializerTimingMixin, SnapshotListMixin,
+)
+from .pagination import (
+    CustomPagination, FeedPagination, KeysetPagination, UserKeysetPagination,
+)
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from .renderers import FastJSONRenderer
 from .utils import create_pdf
 from api.serializers import (
     CustomUserSerializer, FavoriteSerializer, FollowSerializer,
     IngredientSerializer, PlainRecipeSerializer, RecipeReadSerializer,
-    RecipeWriteSerializer, TagSerializer,
+    RecipeWriteSerializer, ShoppingListExportSerializer, TagSerializer,
+    recipe_prefetches,
 )
-from users.models import Follow, User
+from users.models import Follow, User, lock_users
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(SerializerTimingMixin, CursorPaginationMixin,
+                        UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
+    cursor_pagination_class = UserKeysetPagination
 
     @action(
         detail=True,
@@ -37,8 +63,10 @@ class CustomUserViewSet(UserViewSet):
         url_path='subscribe',
         permission_classes=[IsAuthenticated]
     )
+    @transaction.atomic
     def subscribe(self, request, id, **kwargs):
         author_id = id
+        lock_users([request.user.id])
         if request.method == 'POST':
             author = get_object_or_404(User, id=author_id)
             serializer = FollowSerializer(author, context={'request': request})
@@ -46,6 +74,7 @@ class CustomUserViewSet(UserViewSet):
             Follow.objects.create(
                 user=request.user, author=author
             )
+            FeedEntry.objects.backfill(request.user, author)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         user_id = request.user.id
@@ -53,8 +82,33 @@ class CustomUserViewSet(UserViewSet):
             Follow, user__id=user_id, author__id=author_id
         )
         subscribe.delete()
+        FeedEntry.objects.prune(request.user, author_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='bulk_subscribe',
+        permission_classes=[IsAuthenticated]
+    )
+    @transaction.atomic
+    def bulk_subscribe(self, request):
+        author_ids, response = bulk_links(
+            request, Follow, 'author', User.objects.all(), {
+                'not_found': 'Пользователь не найден.',
+                'exists': 'Вы уже подписаны на данного автора.',
+                'missing': 'Вы не подписаны на данного автора.',
+            },
+            rejected={
+                request.user.id: 'Нельзя подписываться на самого себя'
+            } if request.method == 'POST' else None,
+        )
+        if request.method == 'POST':
+            FeedEntry.objects.backfill_many(request.user, author_ids)
+        elif author_ids:
+            FeedEntry.objects.prune_many(request.user, author_ids)
+        return response
+
     @action(
         detail=False,
         url_path='subscriptions',
@@ -62,36 +116,123 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user)
+        queryset = User.objects.filter(following__user=user).annotate(
+            is_subscribed=Value(True),
+        ).order_by('id')
         pages = self.paginate_queryset(queryset)
+        self._prefetch_recipes(pages, request.GET.get('recipes_limit'))
         serializer = FollowSerializer(pages,
                                       many=True,
                                       context={'request': request})
-        return self.get_paginated_response(serializer.data)
+        return self.get_paginated_response(self.serialize(serializer))
+
+    @staticmethod
+    def _prefetch_recipes(authors, recipes_limit):
+        """Загружает рецепты авторов страницы одним запросом.
+
+        При заданном recipes_limit каждому автору достаётся не больше
+        recipes_limit рецептов: они нумеруются оконной функцией
+        ROW_NUMBER() в пределах автора.
+        """
+        recipes = Recipe.objects.filter(author__in=authors).only(
+            'id', 'name', 'cooking_time', 'image', 'author_id'
+        ).order_by('author_id', 'id')
+        if recipes_limit:
+            sql, params = recipes.annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=F('id').asc(),
+                )
+            ).query.sql_with_params()
+            recipes = Recipe.objects.raw(
+                f'SELECT * FROM ({sql}) ranked '
+                f'WHERE ranked.row_number <= %s',
+                (*params, int(recipes_limit)),
+            )
+        recipes_by_author = {author.id: [] for author in authors}
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        for author in authors:
+            author.limited_recipes = recipes_by_author[author.id]
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(SnapshotListMixin, ReadOnlyModelViewSet):
+    snapshot_name = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(name))
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(SnapshotListMixin, ReadOnlyModelViewSet):
+    snapshot_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(SerializerTimingMixin, CursorPaginationMixin,
+                    ModelViewSet):
     serializer_class = RecipeReadSerializer
-    queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly | IsAdminOrReadOnly,)
     pagination_class = CustomPagination
+    cursor_pagination_class = KeysetPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Recipe.objects.prefetch_related(*recipe_prefetches(user))
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not settings.RECIPE_CARDS_FAST_PATH:
+            return renderers
+        return [
+            FastJSONRenderer() if type(renderer) is JSONRenderer else renderer
+            for renderer in renderers
+        ]
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RECIPE_CARDS_FAST_PATH:
+            # Связи загружает RecipeListSerializer и только для
+            # карточек, которых нет в кеше.
+            page = self.paginate_queryset(self.filter_queryset(
+                self.get_queryset()
+            ).prefetch_related(None))
+            return self.get_paginated_response(
+                self.serialize(self.get_serializer(page, many=True))
+            )
+        page = self.paginate_queryset(
+            recipe_rows(
+                self.filter_queryset(self.get_queryset()), request.user
+            )
+        )
+        with serializer_timer(request):
+            cards = recipe_cards(page, request)
+        return self.get_paginated_response(cards)
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -101,8 +242,12 @@ class RecipeViewSet(ModelViewSet):
         return RecipeWriteSerializer
 
     @staticmethod
+    @transaction.atomic
     def _add_recipe_to(request, pk, model, my_serializer):
         recipe_id = pk
+        # Та же блокировка, что в bulk_links и ShoppingListManager.apply:
+        # она берётся первой, до строк связей.
+        lock_users([request.user.id])
         if request.method == 'POST':
             recipe = get_object_or_404(Recipe, id=recipe_id)
             serializer = my_serializer(
@@ -137,6 +282,76 @@ class RecipeViewSet(ModelViewSet):
             request, pk, ShoppingCart, PlainRecipeSerializer
         )
 
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='bulk_favorite',
+        permission_classes=[IsAuthenticated]
+    )
+    @transaction.atomic
+    def bulk_favorite(self, request):
+        return bulk_links(
+            request, Favorite, 'recipe', Recipe.objects.all(), {
+                'not_found': 'Рецепт не найден.',
+                'exists': 'Рецепт уже есть в избранном!',
+                'missing': 'Рецепта нет в избранном.',
+            }
+        )[1]
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='bulk_shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    @transaction.atomic
+    def bulk_shopping_cart(self, request):
+        recipe_ids, response = bulk_links(
+            request, ShoppingCart, 'recipe', Recipe.objects.all(), {
+                'not_found': 'Рецепт не найден.',
+                'exists': 'Рецепт уже добавлен в список покупок.',
+                'missing': 'Рецепта нет в списке покупок.',
+            }
+        )
+        if request.method == 'POST':
+            # bulk_create не отправляет post_save; удалённые строки
+            # вычитают сигналы post_delete.
+            ShoppingListItem.objects.add_recipes([request.user.id], recipe_ids)
+        return response
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        paginator = FeedPagination()
+        entries = paginator.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user).only(
+                'recipe_id', 'pub_date'
+            ),
+            request, self,
+        )
+        ids = [entry.recipe_id for entry in entries]
+        if settings.RECIPE_CARDS_FAST_PATH:
+            recipes = {
+                row['id']: row for row in recipe_rows(
+                    self.get_queryset().filter(id__in=ids), request.user
+                )
+            }
+            with serializer_timer(request):
+                cards = recipe_cards(
+                    [recipes[pk] for pk in ids if pk in recipes], request
+                )
+            return paginator.get_paginated_response(cards)
+        recipes = self.get_queryset().prefetch_related(None).in_bulk(ids)
+        serializer = RecipeReadSerializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(self.serialize(serializer))
+
     @action(
         detail=False,
         methods=['GET'],
@@ -144,14 +359,49 @@ class RecipeViewSet(ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        ingredients = IngredientAmount.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
+        ingredients = request.user.shopping_list.values(
+            'ingredient__name', 'ingredient__measurement_unit',
+            sum_amount=F('amount'),
         ).order_by(
             'ingredient__name'
-        ).annotate(
-            sum_amount=Sum('amount')
         )
         return create_pdf(ingredients)
+
+
+class ShoppingListExportViewSet(SerializerTimingMixin, CreateModelMixin,
+                                RetrieveModelMixin, GenericViewSet):
+    serializer_class = ShoppingListExportSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return ShoppingListExport.objects.alive().filter(
+            user=self.request.user
+        )
+
+    def create(self, request, *args, **kwargs):
+        export = start_export(request.user)
+        serializer = self.get_serializer(export)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['GET'])
+    def download(self, request, pk):
+        export = self.get_object()
+        if export.status != ShoppingListExport.DONE:
+            return Response(
+                {'errors': 'Список покупок ещё не готов.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return FileResponse(
+            export.file.open('rb'), as_attachment=True,
+            filename=settings.SHOPPING_LIST_FILE_NAME
+        )
+
+
+class MetricsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            registry.collect(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
@@ -0,0 +1,221 @@
+"""Пул соединений с базой данных внутри процесса.
+
+Django 3.2 открывает новое соединение на каждый запрос. Пул хранит
+открытые соединения и отдаёт их следующим запросам, проверяя перед
+выдачей, что соединение живо. Пул свой у каждого процесса: соединения
+нельзя передавать через fork.
+"""
+import os
+import threading
+import time
+
+from collections import deque
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Пул соединений размером от min_size до max_size.
+
+    connect открывает новое соединение, check проверяет соединение
+    перед повторной выдачей, reset готовит его к возврату в пул
+    (возвращает False, если соединение больше непригодно), close
+    закрывает. Соединение, простоявшее в пуле меньше check_after
+    секунд, выдаётся без проверки; соединения старше max_lifetime
+    пересоздаются.
+    """
+
+    def __init__(self, connect, check, reset, close, min_size=1,
+                 max_size=10, timeout=10, max_lifetime=3600,
+                 check_after=5):
+        self._connect = connect
+        self._check = check
+        self._reset = reset
+        self._close = close
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._created = {}
+        self._size = 0
+        self._in_use = 0
+        self._filled = False
+        self._closed = False
+        self.waits = 0
+        self.wait_time = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.recycled = 0
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'max_size': self.max_size,
+                'waits': self.waits,
+                'wait_seconds': self.wait_time,
+                'timeouts': self.timeouts,
+                'opened': self.opened,
+                'recycled': self.recycled,
+            }
+
+    def _open(self):
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created[connection] = time.monotonic()
+            self.opened += 1
+        return connection
+
+    def _discard(self, connection):
+        with self._condition:
+            self._created.pop(connection, None)
+            self.recycled += 1
+        try:
+            self._close(connection)
+        except Exception:
+            pass
+
+    def _fill(self):
+        """Открывает min_size соединений при первом обращении."""
+        with self._condition:
+            if self._filled:
+                return
+            self._filled = True
+            missing = max(self.min_size - self._size, 0)
+            self._size += missing
+            self._in_use += missing
+        for _ in range(missing):
+            self.release(self._open())
+
+    def _usable(self, connection, released):
+        created = self._created.get(connection)
+        if created is None or (
+            time.monotonic() - created > self.max_lifetime
+        ):
+            return False
+        if time.monotonic() - released < self.check_after:
+            return True
+        try:
+            return self._check(connection)
+        except Exception:
+            return False
+
+    def acquire(self):
+        self._fill()
+        started = time.monotonic()
+        with self._condition:
+            waited = False
+            while not self._idle and self._size >= self.max_size:
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutError(
+                        f'Нет свободных соединений за {self.timeout} с'
+                    )
+                waited = True
+                self._condition.wait(remaining)
+            if waited:
+                self.waits += 1
+                self.wait_time += time.monotonic() - started
+            self._in_use += 1
+            if self._idle:
+                connection, released = self._idle.pop()
+            else:
+                self._size += 1
+                connection = None
+        if connection is None:
+            return self._open()
+        if self._usable(connection, released):
+            return connection
+        self._discard(connection)
+        return self._open()
+
+    def release(self, connection, broken=False):
+        usable = not broken and not self._closed
+        if usable:
+            try:
+                usable = self._reset(connection)
+            except Exception:
+                usable = False
+        if not usable:
+            self._discard(connection)
+        with self._condition:
+            self._in_use -= 1
+            if usable:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._size -= 1
+            self._condition.notify()
+
+    def close(self):
+        """Закрывает свободные соединения; занятые закроются при
+        возврате."""
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._discard(connection)
+
+
+class Pools:
+    """Пулы процесса по псевдонимам баз данных.
+
+    Пул псевдонима привязан к параметрам соединения: если они сменились
+    (например, тесты переключили NAME на тестовую базу), старый пул
+    закрывается и создаётся новый.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pools = {}
+
+    def get(self, alias, params, factory):
+        key = repr(sorted(params.items()))
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pools = {}
+            old_key, old = self._pools.get(alias, (None, None))
+            if old_key == key:
+                return old
+            pool = factory()
+            self._pools[alias] = (key, pool)
+        if old is not None:
+            old.close()
+        return pool
+
+    def items(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return []
+            return [(alias, pool) for alias, (_, pool) in self._pools.items()]
+
+    def close_all(self):
+        """Закрывает все пулы процесса, например перед удалением
+        тестовой базы."""
+        with self._lock:
+            closing = self._pools if self._pid == os.getpid() else {}
+            self._pools = {}
+        for _, pool in closing.values():
+            pool.close()
+
+
+pools = Pools()
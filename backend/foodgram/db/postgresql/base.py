@@ -0,0 +1,93 @@
+"""Бэкенд PostgreSQL с пулом соединений (см. foodgram.db.pool).
+
+Настройки пула задаются ключом POOL в описании базы данных:
+MIN_SIZE, MAX_SIZE, TIMEOUT, MAX_LIFETIME и CHECK_AFTER.
+
+В пул соединение возвращает close_old_connections в конце запроса
+(close_if_unusable_or_obsolete). Явный close() — например, в
+connections.close_all() или при создании тестовой базы — закрывает
+соединение по-настоящему.
+"""
+import functools
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from ..pool import ConnectionPool, pools
+from .creation import DatabaseCreation
+
+
+def check(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    if connection.info.transaction_status != (
+        extensions.TRANSACTION_STATUS_IDLE
+    ):
+        connection.rollback()
+    return True
+
+
+def reset(connection):
+    if connection.closed:
+        return False
+    status = connection.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return True
+
+
+def close(connection):
+    connection.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release_to_pool = False
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+        return pools.get(self.alias, conn_params, lambda: ConnectionPool(
+            connect=functools.partial(
+                super(DatabaseWrapper, self).get_new_connection, conn_params
+            ),
+            check=check,
+            reset=reset,
+            close=close,
+            min_size=options.get('MIN_SIZE', 1),
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 10),
+            max_lifetime=options.get('MAX_LIFETIME', 3600),
+            check_after=options.get('CHECK_AFTER', 5),
+        ))
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        connection = self.pool.acquire()
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def close_if_unusable_or_obsolete(self):
+        self.release_to_pool = True
+        try:
+            super().close_if_unusable_or_obsolete()
+        finally:
+            self.release_to_pool = False
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # errors_occurred здесь означает, что соединение не прошло
+        # is_usable(): IntegrityError и DataError флаг не ставят, а после
+        # остальных ошибок Django сначала проверяет соединение.
+        with self.wrap_database_errors:
+            self.pool.release(
+                self.connection,
+                broken=self.errors_occurred or not self.release_to_pool,
+            )
@@ -0,0 +1,19 @@
+from django.db.backends.postgresql import creation
+
+from ..pool import pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Закрывает пулы процесса вокруг создания и удаления тестовой базы:
+    CREATE и DROP DATABASE не выполняются, пока к базе открыты
+    соединения."""
+
+    def create_test_db(self, *args, **kwargs):
+        self.connection.close()
+        pools.close_all()
+        return super().create_test_db(*args, **kwargs)
+
+    def destroy_test_db(self, *args, **kwargs):
+        self.connection.close()
+        pools.close_all()
+        super().destroy_test_db(*args, **kwargs)
@@ -0,0 +1,124 @@
+"""Чтение с реплики базы данных.
+
+Если в DATABASES есть псевдоним replica, безопасные запросы (GET, HEAD,
+OPTIONS) читают с реплики. Записи и все запросы внутри изменяющего
+запроса идут в основную базу. После изменяющего запроса клиент ещё
+REPLICA_STICKY_SECONDS секунд читает из основной базы, чтобы сразу
+видеть свои изменения, даже если реплика отстаёт.
+"""
+import asyncio
+import hashlib
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.deprecation import MiddlewareMixin
+
+REPLICA = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_KEY = 'replica_pin:{}'
+# Токен или сессия только что вошедшего пользователя могут ещё не дойти
+# до реплики, поэтому они всегда читаются из основной базы, как и
+# записи кеша в базе данных (DatabaseCache).
+PRIMARY_MODELS = (
+    'authtoken.token', 'sessions.session', 'django_cache.cacheentry',
+)
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_enabled():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def primary_reads():
+    """Читает из основной базы даже в безопасном запросе.
+
+    Так строятся кеши, привязанные к метке версии: метка меняется сразу
+    после фиксации изменения, и отстающая реплика закэшировала бы под
+    новой меткой старые данные до следующего изменения.
+    """
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_enabled() and (
+            model._meta.label_lower not in PRIMARY_MODELS
+        ):
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На реплике те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == REPLICA:
+            return False
+        return None
+
+
+def pin_key(request):
+    """Ключ клиента: токен или сессия. Анонимные запросы без сессии
+    не закрепляются."""
+    credentials = request.META.get('HTTP_AUTHORIZATION') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    return PIN_KEY.format(hashlib.sha256(credentials.encode()).hexdigest())
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not replica_enabled():
+            return self.get_response(request)
+        key = pin_key(request)
+        if request.method in SAFE_METHODS:
+            token = _use_replica.set(not (key and cache.get(key)))
+            try:
+                return self.get_response(request)
+            finally:
+                _use_replica.reset(token)
+        try:
+            return self.get_response(request)
+        finally:
+            if key:
+                cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+
+    async def __acall__(self, request):
+        if not replica_enabled():
+            return await self.get_response(request)
+        key = pin_key(request)
+        if request.method in SAFE_METHODS:
+            pinned = key and await sync_to_async(
+                cache.get, thread_sensitive=False
+            )(key)
+            token = _use_replica.set(not pinned)
+            try:
+                return await self.get_response(request)
+            finally:
+                _use_replica.reset(token)
+        try:
+            return await self.get_response(request)
+        finally:
+            if key:
+                await sync_to_async(cache.set, thread_sensitive=False)(
+                    key, True, settings.REPLICA_STICKY_SECONDS
+                )
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'foodgram.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,18 +75,82 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# Под ASGI (foodgram.asgi) представления API выполняются асинхронно
+# в отдельном пуле потоков.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', 10))
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
+        'ENGINE': os.getenv('DB_ENGINE', 'foodgram.db.postgresql'),
         'NAME': os.getenv('DB_NAME', 'postgres'),
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgresql'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+        },
+    },
+}
+
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+
+def cache_config(backend, location, max_entries):
+    config = {'BACKEND': backend, 'LOCATION': location}
+    if 'memcached' not in backend:
+        # Memcached вытесняет записи сам; файловый и локальный кеш при
+        # превышении MAX_ENTRIES удаляют случайную треть записей.
+        config['OPTIONS'] = {'MAX_ENTRIES': max_entries}
+    return config
+
+
+# default — данные кешей (фрагменты карточек, токены, закрепления за
+# основной базой); в эксплуатации — Memcached (см. infra/example.env).
+# versions — метки версий recipes.versions: их нельзя вытеснять
+# случайно, поэтому у кеша нет практического предела записей.
+CACHES = {
+    'default': cache_config(
+        os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_cache'),
+        ),
+        int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+    ),
+    'versions': {
+        **cache_config(
+            os.getenv(
+                'VERSIONS_CACHE_BACKEND',
+                'django.core.cache.backends.filebased.FileBasedCache',
+            ),
+            os.getenv(
+                'VERSIONS_CACHE_LOCATION',
+                os.path.join(tempfile.gettempdir(), 'foodgram_versions'),
+            ),
+            10 ** 9,
+        ),
+        'TIMEOUT': None,
     },
 }
 
@@ -115,10 +182,26 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
+# Необязательный быстрый путь: списки рецептов собираются из строк
+# .values() без сериализаторов (api.builders), а JSON эндпоинтов
+# рецептов кодирует orjson (api.renderers.FastJSONRenderer).
+RECIPE_CARDS_FAST_PATH = (
+    os.getenv('RECIPE_CARDS_FAST_PATH', 'False') == 'True'
+)
+# Кеш фрагментов карточек рецептов в списках: общая для всех часть
+# карточки хранится под ключом из версий рецепта, автора, тегов и
+# ингредиентов и используется как сериализатором, так и быстрым путём.
+RECIPE_CARD_CACHE = os.getenv('RECIPE_CARD_CACHE', 'True') == 'True'
+RECIPE_CARD_CACHE_TTL = 60 * 60 * 24
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', 'True') == 'True'
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -156,7 +239,40 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Файлы, которые отдаются только через API (выгрузки списков покупок).
+PRIVATE_MEDIA_ROOT = os.getenv(
+    'PRIVATE_MEDIA_ROOT', os.path.join(BASE_DIR, 'private')
+)
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SHOPPING_LIST_FILE_NAME = 'shopping_list.pdf'
+SHOPPING_LIST_SPOOL_SIZE = 1024 * 1024
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1200,
+}
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+SHOPPING_LIST_EXPORT_WORKERS = int(
+    os.getenv('SHOPPING_LIST_EXPORT_WORKERS', 1)
+)
+
+SHOPPING_LIST_EXPORT_TTL = 60 * 60
+SHOPPING_LIST_EXPORT_TIMEOUT = 10 * 60
+
+FEED_BACKFILL_LIMIT = 500
+
+# Наибольшее число id в одном массовом запросе (api.bulk).
+BULK_MAX_IDS = 100
+
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'foodgram_metrics')
+)
+METRICS_FLUSH_INTERVAL = 10
+# Файл воркера, не обновлявшийся дольше этого срока, считается
+# оставшимся от аварийно завершившегося процесса (api.metrics).
+METRICS_STALE_AFTER = 6 * METRICS_FLUSH_INTERVAL
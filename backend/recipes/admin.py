@@ -4,8 +4,10 @@ from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
 from .models import (
-    Favorite, Ingredient, IngredientAmount, Recipe, ShoppingCart, Tag,
+    Favorite, Ingredient, IngredientAmount, Recipe, ShoppingCart,
+    ShoppingListExport, ShoppingListItem, Tag,
 )
+from .versions import bump_version
 
 EMPTY_VALUE_DISPLAY = '-пусто-'
 
@@ -15,6 +17,14 @@ class IngredientResource(resources.ModelResource):
     class Meta:
         model = Ingredient
 
+    def after_import(self, dataset, result, using_transactions, dry_run,
+                     **kwargs):
+        super().after_import(
+            dataset, result, using_transactions, dry_run, **kwargs
+        )
+        if not dry_run:
+            bump_version('ingredients')
+
 
 class IngredientAdmin(ImportExportModelAdmin):
     resource_classes = [IngredientResource]
@@ -44,7 +54,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @display(description='Общее число добавлений в избранное')
     def added_in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(IngredientAmount)
@@ -65,4 +75,17 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     empty_value_display = EMPTY_VALUE_DISPLAY
 
 
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'amount')
+    empty_value_display = EMPTY_VALUE_DISPLAY
+
+
+@admin.register(ShoppingListExport)
+class ShoppingListExportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'created', 'finished')
+    list_filter = ('status',)
+    empty_value_display = EMPTY_VALUE_DISPLAY
+
+
 admin.site.register(Ingredient, IngredientAdmin)
@@ -0,0 +1,57 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+# Счётчик: (модель, поле, модель со строками, внешний ключ на модель).
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change(model, pk, field, delta):
+    """Атомарно меняет счётчик одной строки на delta.
+
+    Счётчик не уходит ниже нуля, даже если уже разошёлся с данными.
+    """
+    change_many(model, (pk,), field, delta)
+
+
+def change_many(model, pks, field, delta):
+    """Меняет на delta счётчики строк pks одним запросом."""
+    if not pks:
+        return
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def actual(source, key):
+    """Подзапрос с настоящим значением счётчика для каждой строки."""
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{key: OuterRef('pk')}).order_by().values(
+                key
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def drifted(model, field, source, key):
+    """Возвращает id строк, у которых счётчик разошёлся с данными."""
+    return list(
+        model.objects.annotate(actual=actual(source, key)).exclude(
+            **{field: F('actual')}
+        ).values_list('pk', flat=True)
+    )
+
+
+def reconcile(model, field, source, key, ids):
+    model.objects.filter(pk__in=ids).update(**{field: actual(source, key)})
@@ -0,0 +1,147 @@
+import io
+import logging
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .versions import RECIPE_VERSION, bump_version
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_WORKERS,
+        thread_name_prefix='image-variants',
+    )
+
+
+def variant_path(name, variant, extension):
+    stem, _ = os.path.splitext(os.path.basename(name))
+    return f'recipes/variants/{stem}_{variant}.{extension}'
+
+
+def save_image(image, path, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    return default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def render_variants(name):
+    """Строит уменьшенные копии изображения name в исходном формате
+    и в WebP. Возвращает {вариант: {формат: путь}}."""
+    with default_storage.open(name) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    has_alpha = original.mode in ('RGBA', 'LA', 'P')
+    variants = {'source': name}
+    for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        if has_alpha:
+            image = image.convert('RGBA')
+            default = save_image(
+                image, variant_path(name, variant, 'png'), 'PNG',
+                optimize=True,
+            )
+        else:
+            image = image.convert('RGB')
+            default = save_image(
+                image, variant_path(name, variant, 'jpg'), 'JPEG',
+                quality=85, optimize=True, progressive=True,
+            )
+        webp = save_image(
+            image, variant_path(name, variant, 'webp'), 'WEBP',
+            quality=80, method=4,
+        )
+        variants[variant] = {'default': default, 'webp': webp}
+    return variants
+
+
+def variant_files(variants):
+    return [
+        path
+        for variant, formats in variants.items() if variant != 'source'
+        for path in formats.values()
+    ]
+
+
+def delete_variants(variants, keep=()):
+    """Удаляет файлы копий, если исходное изображение больше не
+    используется ни одним рецептом."""
+    from .models import Recipe
+
+    source = variants.get('source')
+    if source and Recipe.objects.filter(image=source).exists():
+        return
+    for path in variant_files(variants):
+        if path not in keep:
+            default_storage.delete(path)
+
+
+def remove_variants(variants, keep=()):
+    try:
+        delete_variants(variants, keep)
+    except Exception:
+        logger.exception(
+            'Не удалось удалить копии изображения %s', variants.get('source')
+        )
+    finally:
+        close_old_connections()
+
+
+def schedule_remove_variants(variants, keep=()):
+    transaction.on_commit(
+        lambda: get_executor().submit(remove_variants, variants, keep)
+    )
+
+
+def store_variants(recipe_id, name, variants):
+    """Сохраняет копии в рецепт, если его изображение всё ещё name.
+    Файлы прежних копий удаляются после фиксации транзакции, а копии
+    успевшего смениться изображения — сразу."""
+    from .models import Recipe
+
+    with transaction.atomic():
+        previous = Recipe.objects.select_for_update().filter(
+            id=recipe_id, image=name
+        ).values_list('image_variants', flat=True).first()
+        if previous is not None:
+            Recipe.objects.filter(id=recipe_id).update(
+                image_variants=variants
+            )
+        if previous:
+            schedule_remove_variants(previous, set(variant_files(variants)))
+    if previous is None:
+        delete_variants(variants)
+        return False
+    return True
+
+
+def process_recipe_image(recipe_id, name):
+    try:
+        if store_variants(recipe_id, name, render_variants(name)):
+            bump_version(RECIPE_VERSION.format(recipe_id))
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(recipe):
+    """Ставит построение копий изображения рецепта в очередь пула
+    после фиксации транзакции."""
+    recipe_id, name = recipe.id, recipe.image.name
+    transaction.on_commit(
+        lambda: get_executor().submit(process_recipe_image, recipe_id, name)
+    )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from recipes.images import render_variants, store_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить копии и для уже обработанных рецептов',
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_variants'
+        )
+        for recipe in recipes.iterator():
+            name = recipe.image.name
+            if not options['all'] and (
+                recipe.image_variants.get('source') == name
+            ):
+                continue
+            try:
+                variants = render_variants(name)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            if store_variants(recipe.id, name, variants):
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано: {processed}'))
@@ -0,0 +1,155 @@
+import csv
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import Ingredient
+from recipes.versions import bump_version
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(settings.BASE_DIR), 'data', 'ingredients.json'
+)
+CHUNK_SIZE = 64 * 1024
+
+
+def json_row(item):
+    try:
+        name, measurement_unit = item['name'], item['measurement_unit']
+    except (KeyError, TypeError):
+        raise ValueError('нужны поля name и measurement_unit')
+    if not name:
+        raise ValueError('пустое название')
+    return name, measurement_unit
+
+
+def iter_items(file):
+    """Построчно разбирает JSON-массив объектов, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise CommandError('Ожидался JSON-массив ингредиентов')
+            started = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Файл JSON оборвался или повреждён')
+            chunk = file.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+def iter_json(file, report):
+    """Элементы JSON-массива. Об элементах без нужных полей сообщает
+    report с номером элемента."""
+    for number, item in enumerate(iter_items(file), 1):
+        try:
+            yield json_row(item)
+        except ValueError as error:
+            report(f'Элемент {number}: {error}')
+
+
+def iter_csv(file, report):
+    """Строки CSV «название, единица измерения». О неполных строках
+    сообщает report с номером строки файла."""
+    reader = csv.reader(file)
+    for row in reader:
+        if not row or row == ['name', 'measurement_unit']:
+            continue
+        if len(row) < 2:
+            report(
+                f'Строка {reader.line_num}: нужны название и единица '
+                f'измерения'
+            )
+            continue
+        if not row[0]:
+            report(f'Строка {reader.line_num}: пустое название')
+            continue
+        yield row[0], row[1]
+
+
+class Command(BaseCommand):
+    help = 'Загружает справочник ингредиентов из JSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=DEFAULT_PATH,
+            help='Путь к файлу с ингредиентами',
+        )
+        parser.add_argument(
+            '--format', choices=('json', 'csv'),
+            help='Формат файла, по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько строк вставлять за один запрос',
+        )
+
+    def report(self, error):
+        """Сообщает об ошибочной строке сразу: список ошибок большого
+        файла не копится в памяти."""
+        self.errors += 1
+        self.stderr.write(error)
+
+    def insert(self, batch):
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in batch
+            ],
+            ignore_conflicts=True,
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'json'
+        )
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size должен быть больше нуля')
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден')
+        started = time.perf_counter()
+        total = 0
+        self.errors = 0
+        with transaction.atomic():
+            before = Ingredient.objects.count()
+            with open(path, encoding='utf-8', newline='') as file:
+                parse = iter_csv if file_format == 'csv' else iter_json
+                rows = parse(file, self.report)
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        self.insert(batch)
+                        total += len(batch)
+                        batch = []
+                self.insert(batch)
+                total += len(batch)
+            inserted = Ingredient.objects.count() - before
+            if inserted:
+                bump_version('ingredients')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано: {total}, добавлено: {inserted}, '
+            f'пропущено: {total - inserted}, с ошибками: {self.errors}, '
+            f'время: {time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from recipes.models import ShoppingListExport
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет просроченные выгрузки списков покупок вместе с файлами '
+        'и помечает ошибочными зависшие задания; запускается по расписанию'
+    )
+
+    def handle(self, *args, **options):
+        stalled = ShoppingListExport.objects.fail_stalled()
+        expired = ShoppingListExport.objects.expired().count()
+        ShoppingListExport.objects.purge_expired()
+        self.stdout.write(
+            f'Зависших заданий: {stalled}, удалено выгрузок: {expired}'
+        )
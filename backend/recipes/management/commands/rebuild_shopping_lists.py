@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Сверяет списки покупок с корзинами и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить, ничего не исправляя',
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        expected = ShoppingListItem.objects.expected()
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in ShoppingListItem.objects.select_for_update()
+        }
+        to_create = [
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for (user_id, ingredient_id), amount in expected.items()
+            if (user_id, ingredient_id) not in items
+        ]
+        to_update = []
+        to_delete = []
+        for key, item in items.items():
+            if key not in expected:
+                to_delete.append(item.id)
+            elif item.amount != expected[key]:
+                item.amount = expected[key]
+                to_update.append(item)
+        self.stdout.write(
+            f'Не хватает строк: {len(to_create)}, '
+            f'неверное количество: {len(to_update)}, '
+            f'лишних строк: {len(to_delete)}'
+        )
+        if options['check']:
+            if to_create or to_update or to_delete:
+                raise CommandError('Списки покупок расходятся с корзинами')
+            return
+        ShoppingListItem.objects.bulk_create(to_create, batch_size=1000)
+        ShoppingListItem.objects.bulk_update(
+            to_update, ['amount'], batch_size=1000
+        )
+        ShoppingListItem.objects.filter(id__in=to_delete).delete()
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересобраны'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.counters import COUNTERS, drifted, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики рецептов и пользователей и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить, ничего не исправляя',
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        total = 0
+        for counter in COUNTERS:
+            model, field = counter[:2]
+            ids = drifted(*counter)
+            total += len(ids)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{field}: '
+                f'расхождений {len(ids)}'
+            )
+            if ids and not options['check']:
+                reconcile(*counter, ids)
+        if options['check']:
+            if total:
+                raise CommandError('Счётчики расходятся с данными')
+            return
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:38
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Recipe', 'favorites_count', 'recipes', 'Favorite', 'recipe'),
+    ('recipes', 'Recipe', 'in_carts_count',
+     'recipes', 'ShoppingCart', 'recipe'),
+    ('users', 'User', 'recipes_count', 'recipes', 'Recipe', 'author'),
+    ('users', 'User', 'followers_count', 'users', 'Follow', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, model, field, source_app, source, key in COUNTERS:
+        source = apps.get_model(source_app, source)
+        apps.get_model(app, model).objects.update(**{
+            field: Coalesce(
+                Subquery(
+                    source.objects.filter(
+                        **{key: OuterRef('pk')}
+                    ).order_by().values(key).annotate(
+                        total=Count('pk')
+                    ).values('total'),
+                    output_field=IntegerField(),
+                ),
+                0,
+            )
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_feedentry'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число добавлений в корзины'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
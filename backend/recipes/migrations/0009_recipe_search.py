@@ -0,0 +1,60 @@
+from django.db import migrations
+
+SEARCH_CONFIG = 'russian'
+
+POSTGRESQL_FORWARD = (
+    'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector',
+    f"""
+    CREATE FUNCTION recipes_recipe_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}',
+                                  coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('{SEARCH_CONFIG}',
+                                     coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_search_vector
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector()
+    """,
+    'UPDATE recipes_recipe SET name = name',
+    'CREATE INDEX recipe_search_idx ON recipes_recipe '
+    'USING GIN (search_vector)',
+)
+
+POSTGRESQL_BACKWARD = (
+    'DROP TRIGGER recipes_recipe_search_vector ON recipes_recipe',
+    'DROP FUNCTION recipes_recipe_search_vector()',
+    'ALTER TABLE recipes_recipe DROP COLUMN search_vector',
+)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+    """Индекс полнотекстового поиска рецептов для PostgreSQL.
+
+    Колонка search_vector не описана в модели: ORM о ней не знает,
+    а заполняет её триггер. FTS5-индекс для SQLite создаётся после
+    миграций в recipes.search.ensure_sqlite_index.
+    """
+
+    dependencies = [
+        ('recipes', '0008_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run(POSTGRESQL_FORWARD), run(POSTGRESQL_BACKWARD),
+        ),
+    ]
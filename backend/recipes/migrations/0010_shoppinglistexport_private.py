@@ -0,0 +1,29 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:31
+
+from django.db import migrations, models
+import recipes.storage
+
+
+def drop_public_exports(apps, schema_editor):
+    """Выгрузки с предсказуемыми именами лежат в MEDIA_ROOT, их может
+    скачать кто угодно: удаляем файлы вместе с заданиями."""
+    ShoppingListExport = apps.get_model('recipes', 'ShoppingListExport')
+    for export in ShoppingListExport.objects.exclude(file=''):
+        export.file.delete(save=False)
+    ShoppingListExport.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_public_exports, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='shoppinglistexport',
+            name='file',
+            field=models.FileField(blank=True, storage=recipes.storage.private_storage, upload_to=recipes.storage.export_path, verbose_name='Файл'),
+        ),
+    ]
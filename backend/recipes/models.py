@@ -1,9 +1,15 @@
+from datetime import timedelta
+from itertools import islice
+
 from colorfield.fields import ColorField
+from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import models, transaction
+from django.db.models import Sum, UniqueConstraint
+from django.utils import timezone
 
-from users.models import User
+from .storage import export_path, private_storage
+from users.models import CountersMixin, Follow, User, lock_users
 
 
 class Ingredient(models.Model):
@@ -66,7 +72,7 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CountersMixin, models.Model):
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
@@ -81,6 +87,12 @@ class Recipe(models.Model):
         'Изображение',
         upload_to='recipes/',
     )
+    image_variants = models.JSONField(
+        'Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         'Описание рецепта'
     )
@@ -105,11 +117,26 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'Число добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Число добавлений в корзины',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('favorites_count', 'in_carts_count')
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'), name='recipe_feed_idx'),
+        )
 
     def __str__(self):
         return self.name
@@ -196,3 +223,309 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в Избранное'
+
+
+class ShoppingListManager(models.Manager):
+
+    @transaction.atomic
+    def apply(self, user_ids, amounts):
+        """Прибавляет amounts ({ingredient_id: количество}) к спискам
+        покупок пользователей; отрицательное количество вычитается."""
+        user_ids = sorted(set(user_ids))
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items() if amount
+        }
+        if not user_ids or not amounts:
+            return
+        # Параллельные изменения одного списка не должны создавать
+        # дубликаты строк.
+        lock_users(user_ids)
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.filter(
+                user_id__in=user_ids, ingredient_id__in=amounts
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, amount in amounts.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if amount > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=amount,
+                        ))
+                    continue
+                item.amount += amount
+                if item.amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.id)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ['amount'])
+        self.filter(id__in=to_delete).delete()
+
+    def add_recipes(self, user_ids, recipe_ids, sign=1):
+        """Прибавляет ингредиенты нескольких рецептов одним apply."""
+        self.apply(user_ids, {
+            row['ingredient_id']: sign * row['total']
+            for row in IngredientAmount.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values('ingredient_id').annotate(
+                total=Sum('amount')
+            ).order_by()
+        })
+
+    def remove_recipes(self, user_ids, recipe_ids):
+        self.add_recipes(user_ids, recipe_ids, sign=-1)
+
+    @staticmethod
+    def expected():
+        """Считает списки покупок заново по корзинам пользователей."""
+        return {
+            (row['recipe__shopping_cart__user'], row['ingredient']):
+                row['total']
+            for row in IngredientAmount.objects.filter(
+                recipe__shopping_cart__isnull=False
+            ).values(
+                'recipe__shopping_cart__user', 'ingredient'
+            ).annotate(total=Sum('amount')).order_by()
+        }
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        'Общее количество',
+    )
+
+    objects = ShoppingListManager()
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            UniqueConstraint(fields=['user', 'ingredient'],
+                             name='unique_shopping_list_item')
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} – {self.amount}'
+
+
+class ShoppingListExportManager(models.Manager):
+
+    @staticmethod
+    def deadline():
+        return timezone.now() - timedelta(
+            seconds=settings.SHOPPING_LIST_EXPORT_TTL
+        )
+
+    def expired(self):
+        return self.filter(created__lt=self.deadline())
+
+    def alive(self):
+        return self.filter(created__gte=self.deadline())
+
+    def purge_expired(self):
+        for export in self.expired():
+            if export.file:
+                export.file.delete(save=False)
+            export.delete()
+
+    def fail_stalled(self):
+        """Помечает ошибочными задания, которые не завершились за
+        SHOPPING_LIST_EXPORT_TIMEOUT: их процесс погиб вместе с сервером."""
+        return self.filter(
+            status__in=(self.model.PENDING, self.model.RUNNING),
+            created__lt=timezone.now() - timedelta(
+                seconds=settings.SHOPPING_LIST_EXPORT_TIMEOUT
+            ),
+        ).update(status=self.model.FAILED, finished=timezone.now())
+
+
+class ShoppingListExport(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Формируется'),
+        (DONE, 'Готов'),
+        (FAILED, 'Ошибка'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_exports',
+        verbose_name='Пользователь',
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    file = models.FileField(
+        'Файл',
+        upload_to=export_path,
+        storage=private_storage,
+        blank=True,
+    )
+    created = models.DateTimeField(
+        'Создан',
+        auto_now_add=True,
+        db_index=True,
+    )
+    finished = models.DateTimeField(
+        'Завершён',
+        null=True,
+        blank=True,
+    )
+
+    objects = ShoppingListExportManager()
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'Выгрузка списка покупок'
+        verbose_name_plural = 'Выгрузки списков покупок'
+
+    def __str__(self):
+        return f'{self.user}: {self.get_status_display()}'
+
+
+class FeedEntryManager(models.Manager):
+    batch_size = 1000
+
+    def insert(self, entries):
+        """Вставляет записи пачками по batch_size: bulk_create сначала
+        собирает весь генератор в список."""
+        entries = iter(entries)
+        while True:
+            batch = list(islice(entries, self.batch_size))
+            if not batch:
+                return
+            self.bulk_create(batch, ignore_conflicts=True)
+
+    def fan_out(self, recipe):
+        """Добавляет новый рецепт в ленты всех подписчиков автора."""
+        self.insert(
+            (
+                self.model(
+                    user_id=user_id,
+                    recipe=recipe,
+                    author_id=recipe.author_id,
+                    pub_date=recipe.pub_date,
+                )
+                for user_id in Follow.objects.filter(
+                    author_id=recipe.author_id
+                ).values_list('user_id', flat=True).iterator(
+                    chunk_size=self.batch_size
+                )
+            )
+        )
+
+    def backfill(self, user, author):
+        """Добавляет в ленту последние рецепты автора после подписки."""
+        self.insert(
+            (
+                self.model(
+                    user=user,
+                    recipe_id=recipe_id,
+                    author=author,
+                    pub_date=pub_date,
+                )
+                for recipe_id, pub_date in author.recipes.order_by(
+                    '-pub_date'
+                ).values_list(
+                    'id', 'pub_date'
+                )[:settings.FEED_BACKFILL_LIMIT]
+            )
+        )
+
+    def backfill_many(self, user, author_ids):
+        """backfill для нескольких авторов."""
+        self.insert(
+            (
+                self.model(
+                    user=user,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for author_id in author_ids
+                for recipe_id, pub_date in Recipe.objects.filter(
+                    author_id=author_id
+                ).order_by('-pub_date').values_list(
+                    'id', 'pub_date'
+                )[:settings.FEED_BACKFILL_LIMIT]
+            )
+        )
+
+    def prune(self, user, author):
+        self.filter(user=user, author=author).delete()
+
+    def prune_many(self, user, author_ids):
+        self.filter(user=user, author_id__in=author_ids).delete()
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Читатель',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации',
+    )
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_timeline_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_author_idx',
+            ),
+        )
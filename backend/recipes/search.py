@@ -0,0 +1,119 @@
+"""Полнотекстовый поиск рецептов по названию и описанию.
+
+На PostgreSQL поиск идёт по колонке search_vector с GIN-индексом
+из миграции 0009_recipe_search, на SQLite — по FTS5-таблице
+recipes_recipe_fts. Обе поддерживаются триггерами базы данных, поэтому
+в индекс попадают и рецепты, созданные через bulk_create или админку.
+"""
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+WORD = re.compile(r'\w+')
+
+SQLITE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5(
+    name, text, content='recipes_recipe', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+SQLITE_TRIGGERS = {
+    'recipes_recipe_fts_insert': """
+        CREATE TRIGGER recipes_recipe_fts_insert
+        AFTER INSERT ON recipes_recipe BEGIN
+            INSERT INTO recipes_recipe_fts(rowid, name, text)
+            VALUES (new.id, new.name, new.text);
+        END
+    """,
+    'recipes_recipe_fts_delete': """
+        CREATE TRIGGER recipes_recipe_fts_delete
+        AFTER DELETE ON recipes_recipe BEGIN
+            INSERT INTO recipes_recipe_fts(
+                recipes_recipe_fts, rowid, name, text
+            ) VALUES ('delete', old.id, old.name, old.text);
+        END
+    """,
+    'recipes_recipe_fts_update': """
+        CREATE TRIGGER recipes_recipe_fts_update
+        AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+            INSERT INTO recipes_recipe_fts(
+                recipes_recipe_fts, rowid, name, text
+            ) VALUES ('delete', old.id, old.name, old.text);
+            INSERT INTO recipes_recipe_fts(rowid, name, text)
+            VALUES (new.id, new.name, new.text);
+        END
+    """,
+}
+
+
+def ensure_sqlite_index(using):
+    """Создаёт FTS5-индекс и его триггеры, если их нет.
+
+    SQLite пересоздаёт таблицу при изменении её схемы и теряет
+    триггеры, поэтому проверка выполняется после каждого migrate;
+    недостающие триггеры восстанавливаются, а индекс пересобирается.
+    """
+    database = connections[using]
+    if 'recipes_recipe' not in database.introspection.table_names():
+        return
+    with database.cursor() as cursor:
+        cursor.execute(SQLITE_TABLE)
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'recipes_recipe'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = [
+            sql for name, sql in SQLITE_TRIGGERS.items()
+            if name not in existing
+        ]
+        for sql in missing:
+            cursor.execute(sql)
+        if missing:
+            cursor.execute(
+                "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) "
+                "VALUES ('rebuild')"
+            )
+
+
+def fts5_query(query):
+    """Собирает из пользовательского ввода безопасный запрос FTS5:
+    каждое слово ищется как префикс, все слова обязательны."""
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query))
+
+
+def search_recipes(queryset, query):
+    """Оставляет в queryset найденные рецепты и сортирует их
+    по релевантности (аннотация search_rank)."""
+    if not WORD.search(query):
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = f"plainto_tsquery('{SEARCH_CONFIG}', %s)"
+        queryset = queryset.annotate(search_rank=RawSQL(
+            f'ts_rank(recipes_recipe.search_vector, {tsquery})', (query,),
+            output_field=FloatField(),
+        )).extra(
+            where=[f'recipes_recipe.search_vector @@ {tsquery}'],
+            params=[query],
+        )
+    elif vendor == 'sqlite':
+        queryset = queryset.extra(
+            select={
+                'search_rank': '-bm25(recipes_recipe_fts, 10.0, 1.0)',
+            },
+            tables=['recipes_recipe_fts'],
+            where=[
+                'recipes_recipe_fts.rowid = recipes_recipe.id',
+                'recipes_recipe_fts MATCH %s',
+            ],
+            params=[fts5_query(query)],
+        )
+    else:
+        queryset = queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
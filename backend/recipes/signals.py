@@ -0,0 +1,184 @@
+from django.db import connections
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_migrate, post_save, pre_save,
+)
+from django.dispatch import receiver
+
+from . import counters
+from .images import schedule_remove_variants, schedule_variants
+from .models import (
+    Favorite, FeedEntry, Ingredient, IngredientAmount, Recipe, ShoppingCart,
+    ShoppingListItem, Tag,
+)
+from .search import ensure_sqlite_index
+from .versions import AUTHOR_VERSION, RECIPE_VERSION, bump_version
+from users.models import Follow, User
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(**kwargs):
+    bump_version('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(**kwargs):
+    bump_version('tags')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, **kwargs):
+    if created:
+        FeedEntry.objects.fan_out(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_counted(instance, created, **kwargs):
+    if created:
+        counters.change(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_uncounted(instance, **kwargs):
+    counters.change(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_counted(instance, created, **kwargs):
+    if created:
+        counters.change(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncounted(instance, **kwargs):
+    counters.change(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_counted(instance, created, **kwargs):
+    if created:
+        counters.change(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_uncounted(instance, **kwargs):
+    counters.change(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_counted(instance, created, **kwargs):
+    if created:
+        counters.change(Recipe, instance.recipe_id, 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def cart_uncounted(instance, **kwargs):
+    counters.change(Recipe, instance.recipe_id, 'in_carts_count', -1)
+
+
+# Список покупок меняется в той же транзакции, что и корзина или
+# ингредиенты рецепта, в том числе при каскадном удалении и в админке.
+# Удаление строки вычитает её пары с ещё существующими строками другой
+# модели, поэтому при каскаде каждая пара вычитается ровно один раз.
+@receiver(pre_save, sender=ShoppingCart)
+@receiver(pre_save, sender=IngredientAmount)
+def remember_previous(sender, instance, **kwargs):
+    instance._previous = sender.objects.filter(
+        pk=instance.pk
+    ).first() if instance.pk else None
+
+
+def cart_user_ids(recipe_id):
+    return list(ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def cart_deleted(instance, **kwargs):
+    ShoppingListItem.objects.remove_recipes(
+        [instance.user_id], [instance.recipe_id]
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_saved(instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if previous is not None:
+        if (previous.user_id, previous.recipe_id) == (
+            instance.user_id, instance.recipe_id
+        ):
+            return
+        cart_deleted(previous)
+    ShoppingListItem.objects.add_recipes(
+        [instance.user_id], [instance.recipe_id]
+    )
+
+
+@receiver(post_delete, sender=IngredientAmount)
+def amount_deleted(instance, **kwargs):
+    if getattr(instance, 'shopping_list_applied', False):
+        # Удаление уже учтено одним изменением на весь рецепт.
+        return
+    ShoppingListItem.objects.apply(
+        cart_user_ids(instance.recipe_id),
+        {instance.ingredient_id: -instance.amount},
+    )
+
+
+@receiver(post_save, sender=IngredientAmount)
+def amount_saved(instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if previous is not None:
+        amount_deleted(previous)
+    ShoppingListItem.objects.apply(
+        cart_user_ids(instance.recipe_id),
+        {instance.ingredient_id: instance.amount},
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, **kwargs):
+    if instance.image and (
+        instance.image_variants.get('source') != instance.image.name
+    ):
+        schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    if instance.image_variants:
+        schedule_remove_variants(instance.image_variants)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    bump_version(RECIPE_VERSION.format(instance.id))
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def recipe_amounts_changed(instance, **kwargs):
+    bump_version(RECIPE_VERSION.format(instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_version(RECIPE_VERSION.format(instance.pk))
+        return
+    # Изменение со стороны тега: затронутые рецепты известны не всегда.
+    bump_version('tags')
+
+
+@receiver(post_save, sender=User)
+def author_changed(instance, update_fields, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_version(AUTHOR_VERSION.format(instance.id))
+
+
+@receiver(post_migrate)
+def search_index_migrated(sender, using, **kwargs):
+    if sender.name == 'recipes' and connections[using].vendor == 'sqlite':
+        ensure_sqlite_index(using)
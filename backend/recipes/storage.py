@@ -0,0 +1,17 @@
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+def private_storage():
+    """Хранилище вне MEDIA_ROOT: nginx его не раздаёт, файлы отдаются
+    только через API после проверки прав."""
+    return FileSystemStorage(
+        location=settings.PRIVATE_MEDIA_ROOT, base_url=None
+    )
+
+
+def export_path(instance, filename):
+    """Случайное имя файла выгрузки, которое нельзя подобрать по id."""
+    return f'exports/{uuid.uuid4().hex}.pdf'
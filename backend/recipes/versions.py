@@ -0,0 +1,41 @@
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = 'data_version:{}'
+# Метки хранятся в отдельном кеше без случайного вытеснения.
+VERSIONS_CACHE = 'versions'
+# Версии карточки рецепта и публичных данных автора.
+RECIPE_VERSION = 'recipe:{}'
+AUTHOR_VERSION = 'author:{}'
+
+
+def get_version(name):
+    """Возвращает текущую метку версии справочника name."""
+    key = VERSION_KEY.format(name)
+    cache = caches[VERSIONS_CACHE]
+    version = cache.get(key)
+    if version is not None:
+        return version
+    cache.add(key, uuid.uuid4().hex, timeout=None)
+    return cache.get(key)
+
+
+def get_versions(names):
+    """Метки версий нескольких справочников за одно обращение к кешу."""
+    keys = {name: VERSION_KEY.format(name) for name in names}
+    found = caches[VERSIONS_CACHE].get_many(keys.values())
+    return {
+        name: found.get(key) or get_version(name)
+        for name, key in keys.items()
+    }
+
+
+def bump_version(name):
+    """Меняет метку версии после фиксации текущей транзакции."""
+    transaction.on_commit(
+        lambda: caches[VERSIONS_CACHE].set(
+            VERSION_KEY.format(name), uuid.uuid4().hex, timeout=None
+        )
+    )
@@ -0,0 +1,63 @@
+from recipes.models import (
+    Favorite, Ingredient, IngredientAmount, Recipe, ShoppingCart, Tag,
+)
+
+from users.models import Follow, User
+
+
+def create_recipes(authors_count, recipes_count, favorite_every, cart_every):
+    """Авторы, теги, ингредиенты и рецепты для тестов списков рецептов.
+
+    Первый автор — пользователь запросов: он подписан на второго
+    автора, а каждый favorite_every-й и cart_every-й рецепт у него в
+    избранном и в корзине. У рецептов от одного до трёх тегов и по три
+    ингредиента.
+    """
+    authors = [
+        User.objects.create(
+            username=f'author-{number}',
+            email=f'author-{number}@example.com',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        for number in range(authors_count)
+    ]
+    user = authors[0]
+    Follow.objects.create(user=user, author=authors[1])
+    tags = [
+        Tag.objects.create(
+            name=f'Тег {number}', color=f'#0000{number:02X}',
+            slug=f'tag-{number}',
+        )
+        for number in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(10)
+    ]
+    recipes = []
+    for number in range(recipes_count):
+        recipe = Recipe.objects.create(
+            author=authors[number % authors_count],
+            name=f'Рецепт {number}',
+            text='Описание',
+            image='recipes/test.png',
+            cooking_time=number % 60 + 1,
+        )
+        recipe.tags.set(tags[:number % 3 + 1])
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe,
+                ingredient=ingredients[(number + shift) % 10],
+                amount=shift + 1,
+            )
+            for shift in range(3)
+        )
+        if number % favorite_every == 0:
+            Favorite.objects.create(user=user, recipe=recipe)
+        if number % cart_every == 0:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        recipes.append(recipe)
+    return user, tags, ingredients, recipes
@@ -0,0 +1,28 @@
+import asyncio
+
+from django.test import SimpleTestCase
+from django.urls import URLResolver
+
+from api import urls
+from api.asynchronous import asynchronous_urls
+
+
+def callbacks(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from callbacks(pattern.url_patterns)
+        else:
+            yield pattern.name, pattern.callback
+
+
+class AsynchronousUrlsTest(SimpleTestCase):
+    """Под ASGI в пул потоков уходят только частые запросы чтения."""
+
+    def test_only_hot_routes_wrapped(self):
+        wrapped = {
+            name for name, callback in callbacks(
+                asynchronous_urls(urls.urlpatterns, urls.ASYNC_ROUTES)
+            )
+            if asyncio.iscoroutinefunction(callback)
+        }
+        self.assertEqual(wrapped, urls.ASYNC_ROUTES)
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .test_recipe_queries import CACHES
+from api import authentication
+from users.models import User
+
+PASSWORD = 'old-password-123'
+NEW_PASSWORD = 'new-password-456'
+
+
+@override_settings(CACHES=CACHES)
+class CachedTokenAuthenticationTest(TestCase):
+    """Выход, смена пароля и отключение пользователя сразу видны
+    следующему запросу со старым токеном, хотя пользователь взят из
+    кеша токенов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password=PASSWORD,
+            first_name='Имя',
+        )
+
+    def login(self, password=PASSWORD):
+        response = APIClient().post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': password,
+        })
+        self.assertEqual(response.status_code, 200)
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+        )
+        # Второй запрос берёт пользователя из кеша токенов.
+        for _ in range(2):
+            self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        return client
+
+    def modes(self):
+        """Только кеш процесса и вместе с общим кешем."""
+        for shared in (False, True):
+            cache.clear()
+            with self.subTest(shared=shared), override_settings(
+                TOKEN_CACHE_SHARED=shared
+            ), mock.patch.object(
+                authentication, 'token_cache', authentication.TokenCache()
+            ):
+                yield
+
+    def test_logout(self):
+        for _ in self.modes():
+            client = self.login()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/api/auth/token/logout/')
+            self.assertEqual(response.status_code, 204)
+            self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_password_change(self):
+        for _ in self.modes():
+            client = self.login()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/api/users/set_password/', {
+                    'current_password': PASSWORD,
+                    'new_password': NEW_PASSWORD,
+                })
+            self.assertEqual(response.status_code, 204)
+            # Проверка текущего пароля видит уже новый хеш.
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/api/users/set_password/', {
+                    'current_password': NEW_PASSWORD,
+                    'new_password': PASSWORD,
+                })
+            self.assertEqual(response.status_code, 204)
+
+    def test_user_change(self):
+        for number, _ in enumerate(self.modes()):
+            client = self.login()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.first_name = f'Новое имя {number}'
+                self.user.save()
+            self.assertEqual(
+                client.get('/api/users/me/').data['first_name'],
+                f'Новое имя {number}',
+            )
+
+    def test_deactivation(self):
+        for _ in self.modes():
+            client = self.login()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = False
+                self.user.save()
+            self.assertEqual(client.get('/api/users/me/').status_code, 401)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = True
+                self.user.save()
+            self.assertEqual(client.get('/api/users/me/').status_code, 200)
@@ -0,0 +1,143 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from recipes.models import (
+    Favorite, FeedEntry, Ingredient, IngredientAmount, Recipe,
+    ShoppingListItem,
+)
+from rest_framework.test import APIClient
+
+from .test_recipe_queries import CACHES
+from api import bulk
+from users.models import User
+
+MISSING_ID = 10 ** 6
+
+
+@override_settings(CACHES=CACHES)
+class BulkLinksTest(TestCase):
+    """Результаты по каждому id и побочные эффекты массовых запросов:
+    счётчики, список покупок и лента."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com',
+        )
+        cls.author = User.objects.create(
+            username='author', email='author@example.com',
+        )
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(2)
+        ]
+        cls.recipes = []
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', image='recipes/recipe.png',
+                cooking_time=10,
+            )
+            for ingredient in ingredients:
+                IngredientAmount.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1,
+                )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def results(self, method, url, ids):
+        response = getattr(self.client, method)(
+            url, {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (item['id'], item['status']) for item in response.json()['results']
+        ]
+
+    def counts(self, field):
+        return list(Recipe.objects.filter(
+            id__in=[recipe.id for recipe in self.recipes]
+        ).order_by('id').values_list(field, flat=True))
+
+    def shopping_list(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'amount'))
+
+    def test_favorite_results_and_counters(self):
+        first, second, third = self.recipes
+        self.client.post(f'/api/recipes/{second.id}/favorite/')
+        url = '/api/recipes/bulk_favorite/'
+        self.assertEqual(
+            self.results('post', url, [first.id, second.id, MISSING_ID]),
+            [
+                (first.id, bulk.CREATED),
+                (second.id, bulk.ERROR),
+                (MISSING_ID, bulk.ERROR),
+            ],
+        )
+        self.assertEqual(self.counts('favorites_count'), [1, 1, 0])
+        self.assertEqual(
+            self.results('delete', url, [first.id, third.id]),
+            [(first.id, bulk.DELETED), (third.id, bulk.ERROR)],
+        )
+        self.assertEqual(self.counts('favorites_count'), [0, 1, 0])
+
+    def test_shopping_cart_updates_shopping_list(self):
+        first, second, third = self.recipes
+        self.client.post(f'/api/recipes/{first.id}/shopping_cart/')
+        url = '/api/recipes/bulk_shopping_cart/'
+        self.results('post', url, [first.id, second.id, third.id])
+        self.assertEqual(self.counts('in_carts_count'), [1, 1, 1])
+        self.assertEqual(set(self.shopping_list().values()), {1 + 2 + 3})
+        self.results('delete', url, [first.id, third.id])
+        self.assertEqual(self.counts('in_carts_count'), [0, 1, 0])
+        self.assertEqual(set(self.shopping_list().values()), {2})
+        self.assertEqual(ShoppingListItem.objects.expected(), {
+            (self.user.id, ingredient_id): amount
+            for ingredient_id, amount in self.shopping_list().items()
+        })
+
+    def test_link_created_outside_lock_is_not_counted(self):
+        first, second, _ = self.recipes
+        create_links = bulk.create_links
+
+        def concurrent(model, user, key, pks):
+            # Связь появилась между чтением существующих и вставкой.
+            Favorite.objects.create(user=user, recipe=second)
+            return create_links(model, user, key, pks)
+
+        with mock.patch.object(bulk, 'create_links', concurrent):
+            self.assertEqual(
+                self.results(
+                    'post', '/api/recipes/bulk_favorite/',
+                    [first.id, second.id],
+                ),
+                [(first.id, bulk.CREATED), (second.id, bulk.ERROR)],
+            )
+        self.assertEqual(self.counts('favorites_count'), [1, 1, 0])
+
+    def test_subscribe_backfills_feed_and_counts(self):
+        url = '/api/users/bulk_subscribe/'
+        self.assertEqual(
+            self.results('post', url, [self.author.id, self.user.id]),
+            [(self.author.id, bulk.CREATED), (self.user.id, bulk.ERROR)],
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            self.results('post', url, [self.author.id]),
+            [(self.author.id, bulk.ERROR)],
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        self.results('delete', url, [self.author.id])
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
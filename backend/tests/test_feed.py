@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import FeedEntry, Recipe
+
+from users.models import Follow, User
+
+
+class FeedFanOutTest(TestCase):
+    """Записи ленты вставляются пачками по batch_size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com',
+        )
+        for number in range(5):
+            follower = User.objects.create(
+                username=f'follower-{number}',
+                email=f'follower-{number}@example.com',
+            )
+            Follow.objects.create(user=follower, author=cls.author)
+
+    def inserts(self, captured):
+        table = FeedEntry._meta.db_table
+        return [
+            query for query in captured.captured_queries
+            if query['sql'].startswith('INSERT') and table in query['sql']
+        ]
+
+    @mock.patch.object(FeedEntry.objects, 'batch_size', 2)
+    def test_fan_out_in_batches(self):
+        with CaptureQueriesContext(connection) as captured:
+            recipe = Recipe.objects.create(
+                author=self.author, name='Рецепт', text='Описание',
+                image='recipes/recipe.png', cooking_time=10,
+            )
+        self.assertEqual(len(self.inserts(captured)), 3)
+        self.assertEqual(
+            FeedEntry.objects.filter(recipe=recipe).count(), 5
+        )
+
+    @mock.patch.object(FeedEntry.objects, 'batch_size', 2)
+    def test_backfill_many_in_batches(self):
+        for number in range(3):
+            Recipe.objects.create(
+                author=self.author, name=f'Рецепт {number}',
+                text='Описание', image='recipes/recipe.png', cooking_time=10,
+            )
+        reader = User.objects.create(
+            username='reader', email='reader@example.com',
+        )
+        with CaptureQueriesContext(connection) as captured:
+            FeedEntry.objects.backfill_many(reader, [self.author.id])
+        self.assertEqual(len(self.inserts(captured)), 2)
+        self.assertEqual(FeedEntry.objects.filter(user=reader).count(), 3)
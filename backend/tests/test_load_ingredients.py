@@ -0,0 +1,89 @@
+import os
+import tempfile
+
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from recipes.management.commands.load_ingredients import Command
+from recipes.models import Ingredient
+
+
+class LoadIngredientsTest(TestCase):
+    """Ошибочные строки файла пропускаются с указанием их номера."""
+
+    def write(self, suffix, content):
+        file, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(file, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def load(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'load_ingredients', path, *args, stdout=stdout, stderr=stderr
+        )
+        return stdout.getvalue(), stderr.getvalue().splitlines()
+
+    def test_bad_csv_rows_are_reported(self):
+        path = self.write('.csv', (
+            'name,measurement_unit\n'
+            'соль,г\n'
+            'перец\n'
+            ',г\n'
+            'сахар,г\n'
+        ))
+        stdout, errors = self.load(path, '--batch-size', '1')
+        self.assertEqual(errors, [
+            'Строка 3: нужны название и единица измерения',
+            'Строка 4: пустое название',
+        ])
+        self.assertIn('с ошибками: 2', stdout)
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', flat=True)),
+            {'соль', 'сахар'},
+        )
+
+    def test_bad_rows_are_reported_as_found(self):
+        path = self.write('.csv', 'перец\nсоль,г\n,г\nсахар,г\n')
+        stderr = StringIO()
+        reported = []
+
+        def insert(command, batch):
+            if batch:
+                reported.append(stderr.getvalue().splitlines())
+
+        with mock.patch.object(Command, 'insert', insert):
+            call_command(
+                'load_ingredients', path, '--batch-size', '1',
+                stdout=StringIO(), stderr=stderr,
+            )
+        self.assertEqual(reported, [
+            ['Строка 1: нужны название и единица измерения'],
+            [
+                'Строка 1: нужны название и единица измерения',
+                'Строка 3: пустое название',
+            ],
+        ])
+
+    def test_bad_json_items_are_reported(self):
+        path = self.write('.json', (
+            '[{"name": "соль", "measurement_unit": "г"}, '
+            '{"name": "перец"}, 5]'
+        ))
+        _, errors = self.load(path)
+        self.assertEqual(errors, [
+            'Элемент 2: нужны поля name и measurement_unit',
+            'Элемент 3: нужны поля name и measurement_unit',
+        ])
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+    def test_batch_size_must_be_positive(self):
+        path = self.write('.csv', 'соль,г\n')
+        for batch_size in ('0', '-1'):
+            with self.subTest(batch_size=batch_size):
+                with self.assertRaises(CommandError):
+                    self.load(path, '--batch-size', batch_size)
+        self.assertFalse(Ingredient.objects.exists())
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import time
+
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .test_recipe_queries import CACHES
+from api.metrics import Registry, registry
+from api.serializers import RecipeListSerializer
+
+LABELS = (('route', 'recipes-list'), ('method', 'GET'))
+
+
+class MetricsRegistryTest(SimpleTestCase):
+    """Файлы завершившихся воркеров переносятся в retired.json, а
+    счётчики при этом не уменьшаются."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(METRICS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory
+
+    def worker(self):
+        registry = Registry()
+        self.addCleanup(setattr, registry, '_closed', True)
+        registry.increment('foodgram_responses_total', LABELS)
+        registry.observe('foodgram_sql_queries', LABELS, 3)
+        registry.flush(force=True)
+        return registry
+
+    def total(self, registry, name):
+        return registry.load()[(name, LABELS)]
+
+    def test_closed_worker_is_retired(self):
+        first, second = self.worker(), self.worker()
+        first.close()
+        self.assertFalse(os.path.exists(first._path))
+        self.assertEqual(
+            self.total(second, 'foodgram_responses_total'), 2
+        )
+        self.assertEqual(
+            self.total(second, 'foodgram_sql_queries')[-1], 6
+        )
+
+    def test_stale_worker_is_retired(self):
+        stale, alive = self.worker(), self.worker()
+        past = time.time() - 3600
+        os.utime(stale._path, (past, past))
+        self.assertEqual(self.total(alive, 'foodgram_responses_total'), 2)
+        self.assertFalse(os.path.exists(stale._path))
+        # Воркер, которого сочли завершившимся, не учитывается дважды.
+        stale.flush(force=True)
+        self.assertEqual(self.total(alive, 'foodgram_responses_total'), 2)
+        stale.increment('foodgram_responses_total', LABELS)
+        stale.flush(force=True)
+        self.assertEqual(self.total(alive, 'foodgram_responses_total'), 3)
+
+
+@override_settings(CACHES=CACHES, RECIPE_CARDS_FAST_PATH=False)
+class SerializerDurationTest(TestCase):
+    """Гистограмма сериализации замеряет serializer.data, а не
+    кодирование ответа в JSON."""
+
+    def observed(self, url):
+        with mock.patch.object(registry, 'observe') as observe:
+            self.assertEqual(APIClient().get(url).status_code, 200)
+        return {
+            name: value for (name, labels, value), _ in observe.call_args_list
+        }
+
+    def test_serializer_duration(self):
+        def slow(serializer, data):
+            time.sleep(0.05)
+            return []
+
+        with mock.patch.object(
+            RecipeListSerializer, 'to_representation', slow
+        ):
+            observed = self.observed('/api/recipes/')
+        self.assertGreaterEqual(
+            observed['foodgram_serializer_duration_seconds'], 0.05
+        )
+        self.assertLess(observed['foodgram_render_duration_seconds'], 0.05)
@@ -0,0 +1,91 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+from .test_recipe_queries import CACHES
+from users.models import Follow, User
+
+
+@override_settings(CACHES=CACHES, RECIPE_CARDS_FAST_PATH=False)
+class KeysetPaginationTest(TestCase):
+    """Страницы по курсору не пересекаются и покрывают весь список,
+    в том числе при одинаковом времени публикации; неверный курсор
+    отклоняется с ответом 400."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='user', email='user@example.com',
+        )
+        authors = [
+            User.objects.create(
+                username=f'author-{number}',
+                email=f'author-{number}@example.com',
+            )
+            for number in range(7)
+        ]
+        for author in authors:
+            Follow.objects.create(user=cls.user, author=author)
+        for number in range(11):
+            Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}', text='Описание',
+                image='recipes/test.png', cooking_time=number + 1,
+            )
+        # Половина рецептов опубликована в одно время: порядок
+        # определяет id.
+        Recipe.objects.filter(id__in=Recipe.objects.order_by('id').values(
+            'id'
+        )[:6]).update(pub_date=timezone.now())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def pages(self, url, limit):
+        """Идентификаторы записей по страницам, пока есть next."""
+        pages = []
+        params = {'limit': limit, 'cursor': ''}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append([item['id'] for item in response.data['results']])
+            if response.data['next'] is None:
+                return pages
+            params = {
+                name: values[0] for name, values in parse_qs(
+                    urlparse(response.data['next']).query
+                ).items()
+            }
+
+    def test_pages_do_not_overlap(self):
+        cases = (
+            ('/api/recipes/', list(Recipe.objects.order_by(
+                '-pub_date', '-id'
+            ).values_list('id', flat=True))),
+            ('/api/users/subscriptions/', list(User.objects.filter(
+                following__user=self.user
+            ).order_by('id').values_list('id', flat=True))),
+        )
+        for url, expected in cases:
+            for limit in (1, 3, 4):
+                with self.subTest(url=url, limit=limit):
+                    pages = self.pages(url, limit)
+                    self.assertTrue(all(
+                        len(page) == limit for page in pages[:-1]
+                    ))
+                    self.assertEqual(
+                        [pk for page in pages for pk in page], expected
+                    )
+
+    def test_malformed_cursor(self):
+        for cursor in ('garbage', 'W10=', 'WyJ4Il0=', 'WzEsIDJd', '%%%'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['detail'], 'Неверный курсор.')
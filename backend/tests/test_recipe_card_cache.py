@@ -0,0 +1,93 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from recipes.models import Favorite, Ingredient, IngredientAmount, Recipe, Tag
+from rest_framework.test import APIClient
+
+from .test_recipe_queries import CACHES
+from users.models import Follow, User
+
+
+@override_settings(CACHES=CACHES, RECIPE_CARDS_FAST_PATH=False)
+class RecipeCardCacheTest(TestCase):
+    """Сериализатор списка рецептов читает карточки из кеша фрагментов,
+    а изменение рецепта, тега или автора делает их устаревшими."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='user', email='user@example.com',
+        )
+        cls.author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.tag = Tag.objects.create(
+            name='Тег', color='#000000', slug='tag'
+        )
+        ingredient = Ingredient.objects.create(
+            name='Ингредиент', measurement_unit='г'
+        )
+        for number in range(3):
+            cls.recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=number + 1,
+            )
+            cls.recipe.tags.set([cls.tag])
+            IngredientAmount.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=number + 1,
+            )
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def cards(self, client=None):
+        response = (client or self.client).get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return {card['id']: card for card in response.json()['results']}
+
+    def test_second_request_served_from_cache(self):
+        # Количество, страница, теги, ингредиенты, авторы.
+        with self.assertNumQueries(5):
+            first = self.cards()
+        # Количество, страница, подписки пользователя.
+        with self.assertNumQueries(3):
+            second = self.cards()
+        self.assertEqual(first, second)
+        self.assertTrue(second[self.recipe.id]['author']['is_subscribed'])
+
+    def test_user_fields_not_cached(self):
+        self.cards()
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        self.assertTrue(self.cards()[self.recipe.id]['is_favorited'])
+        self.assertFalse(self.cards(APIClient())[self.recipe.id][
+            'is_favorited'
+        ])
+
+    def test_recipe_edit_invalidates_card(self):
+        self.cards()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+        self.assertEqual(
+            self.cards()[self.recipe.id]['name'], 'Новое название'
+        )
+
+    def test_tag_edit_invalidates_cards(self):
+        self.cards()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Новый тег'
+            self.tag.save()
+        for card in self.cards().values():
+            self.assertEqual(card['tags'][0]['name'], 'Новый тег')
+
+    def test_author_edit_invalidates_cards(self):
+        self.cards()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Новое имя'
+            self.author.save()
+        for card in self.cards().values():
+            self.assertEqual(card['author']['first_name'], 'Новое имя')
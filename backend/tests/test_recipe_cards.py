@@ -0,0 +1,120 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from recipes.models import Recipe
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .fixtures import create_recipes
+from .test_recipe_queries import CACHES
+from api.builders import recipe_cards, recipe_rows
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeReadSerializer
+from api.views import RecipeViewSet
+
+
+@override_settings(CACHES=CACHES)
+class RecipeCardsParityTest(TestCase):
+    """Быстрый путь (api.builders и FastJSONRenderer) отдаёт те же байты,
+    что и RecipeReadSerializer с JSONRenderer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.tags, _, recipes = create_recipes(
+            authors_count=4, recipes_count=30, favorite_every=3,
+            cart_every=3,
+        )
+        cls.recipe = recipes[0]
+        # Данные, на которых легко разойтись с сериализаторами: копии
+        # изображений, рецепт без изображения, \u2028 и \u2029 в тексте.
+        for recipe in recipes[::2]:
+            Recipe.objects.filter(id=recipe.id).update(image_variants={
+                'source': recipe.image.name,
+                'card': {
+                    'webp': f'recipes/variants/{recipe.id}-card.webp',
+                    'jpeg': f'recipes/variants/{recipe.id}-card.jpg',
+                },
+            })
+        Recipe.objects.filter(id=recipes[-2].id).update(image='')
+        Recipe.objects.filter(id=recipes[-3].id).update(
+            text='Строка\u2028абзац\u2029и «кавычки» 🍲'
+        )
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def get(self, client, url, params, fast_path, card_cache=True):
+        with override_settings(
+            RECIPE_CARDS_FAST_PATH=fast_path, RECIPE_CARD_CACHE=card_cache
+        ):
+            response = client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def test_api_responses_match(self):
+        anonymous = APIClient()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        params = {'limit': 10}
+        cases = (
+            ('аноним', anonymous, '/api/recipes/', params),
+            ('пользователь', client, '/api/recipes/', params),
+            ('страница 2', client, '/api/recipes/', {**params, 'page': 2}),
+            ('курсор', client, '/api/recipes/', {**params, 'cursor': ''}),
+            ('теги', client, '/api/recipes/', {
+                **params, 'tags': [tag.slug for tag in self.tags[1:]],
+            }),
+            ('поиск', client, '/api/recipes/', {
+                **params, 'search': 'рецепт',
+            }),
+            ('избранное', client, '/api/recipes/', {
+                **params, 'is_favorited': 1,
+            }),
+            ('лента', client, '/api/recipes/feed/', params),
+            ('рецепт', client, f'/api/recipes/{self.recipe.id}/', {}),
+        )
+        # Образец — сериализаторы без кеша фрагментов. Оба пути кладут
+        # фрагменты под одни ключи, поэтому кеш очищается перед каждым,
+        # а второй проход читает карточки из кеша.
+        for title, api_client, url, query in cases:
+            expected = self.get(api_client, url, query, False, False)
+            for fast_path in (False, True):
+                caches['default'].clear()
+                for attempt in ('кеш пуст', 'кеш заполнен'):
+                    with self.subTest(
+                        case=title, fast_path=fast_path, attempt=attempt
+                    ):
+                        self.assertEqual(
+                            self.get(api_client, url, query, fast_path),
+                            expected,
+                        )
+
+    @override_settings(RECIPE_CARD_CACHE=False)
+    def test_builders_match_serializers(self):
+        for user in (AnonymousUser(), self.user):
+            request = Request(APIRequestFactory().get('/api/recipes/'))
+            request.user = user
+            view = RecipeViewSet(request=request, action='list', kwargs={})
+            queryset = view.filter_queryset(view.get_queryset())
+            with self.subTest(user=user):
+                self.assertEqual(
+                    FastJSONRenderer().render(recipe_cards(
+                        recipe_rows(queryset, user), request
+                    )),
+                    JSONRenderer().render(RecipeReadSerializer(
+                        queryset, many=True,
+                        context={'request': request, 'view': view},
+                    ).data),
+                )
+
+    def test_renderer_matches(self):
+        data = {
+            'text': 'Строка\u2028абзац\u2029и «кавычки» 🍲',
+            'list': [1, 2.5, None, True],
+            'nested': {'id': 1},
+        }
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
@@ -0,0 +1,92 @@
+import io
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+from recipes.images import (
+    delete_variants, render_variants, store_variants, variant_files,
+)
+from recipes.models import Recipe
+
+from users.models import User
+
+
+class RecipeImageVariantsTest(TestCase):
+    """Файлы копий изображения удаляются вместе с ненужными копиями."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.author = User.objects.create(
+            username='author', email='author@example.com',
+        )
+
+    @staticmethod
+    def save_image(name):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), 'orange').save(buffer, 'PNG')
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def create_recipe(self, image):
+        return Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            image=image, cooking_time=10,
+        )
+
+    def assert_files_exist(self, variants, exist=True):
+        for path in variant_files(variants):
+            self.assertEqual(default_storage.exists(path), exist, path)
+
+    def test_replaced_variants_are_deleted(self):
+        first = self.save_image('recipes/first.png')
+        recipe = self.create_recipe(first)
+        first_variants = render_variants(first)
+        self.assertTrue(store_variants(recipe.id, first, first_variants))
+        second = self.save_image('recipes/second.png')
+        Recipe.objects.filter(id=recipe.id).update(image=second)
+        second_variants = render_variants(second)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertTrue(
+                store_variants(recipe.id, second, second_variants)
+            )
+        self.assertEqual(len(callbacks), 1)
+        delete_variants(first_variants, set(variant_files(second_variants)))
+        self.assert_files_exist(first_variants, exist=False)
+        self.assert_files_exist(second_variants)
+
+    def test_variants_of_changed_image_are_deleted(self):
+        first = self.save_image('recipes/first.png')
+        recipe = self.create_recipe(first)
+        variants = render_variants(first)
+        Recipe.objects.filter(id=recipe.id).update(
+            image=self.save_image('recipes/second.png')
+        )
+        self.assertFalse(store_variants(recipe.id, first, variants))
+        self.assert_files_exist(variants, exist=False)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
+
+    def test_shared_variants_are_kept(self):
+        image = self.save_image('recipes/shared.png')
+        recipe = self.create_recipe(image)
+        self.create_recipe(image)
+        variants = render_variants(image)
+        store_variants(recipe.id, image, variants)
+        recipe.delete()
+        delete_variants(variants)
+        self.assert_files_exist(variants)
+
+    def test_deleted_recipe_variants_are_deleted(self):
+        image = self.save_image('recipes/first.png')
+        recipe = self.create_recipe(image)
+        store_variants(recipe.id, image, render_variants(image))
+        recipe.refresh_from_db()
+        recipe.delete()
+        delete_variants(recipe.image_variants)
+        self.assert_files_exist(recipe.image_variants, exist=False)
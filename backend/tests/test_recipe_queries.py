@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recipes.models import IngredientAmount, Recipe, ShoppingCart
+from rest_framework.test import APIClient
+
+from .fixtures import create_recipes
+from users.models import User
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versions',
+        'TIMEOUT': None,
+    },
+}
+
+
+@override_settings(CACHES=CACHES, RECIPE_CARDS_FAST_PATH=False)
+class RecipeQueriesTest(TestCase):
+    """Число запросов списка и рецепта не зависит от размера страницы
+    и пользователя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.tags, cls.ingredients, recipes = create_recipes(
+            authors_count=5, recipes_count=120, favorite_every=4,
+            cart_every=5,
+        )
+        cls.recipe = recipes[-1]
+
+    def clients(self):
+        authorized = APIClient()
+        authorized.force_authenticate(self.user)
+        return (('аноним', APIClient()), ('пользователь', authorized))
+
+    def test_list_queries(self):
+        # Пустой кеш карточек: количество, страница, теги, ингредиенты,
+        # авторы. Заполненный: количество, страница и подписки
+        # пользователя.
+        for (title, client), cached in zip(self.clients(), (2, 3)):
+            for limit in (6, 100):
+                cache.clear()
+                for attempt, queries in (('кеш пуст', 5), ('кеш', cached)):
+                    with self.subTest(
+                        user=title, limit=limit, attempt=attempt
+                    ):
+                        with self.assertNumQueries(queries):
+                            response = client.get(
+                                '/api/recipes/', {'limit': limit}
+                            )
+                        self.assertEqual(
+                            len(response.data['results']), limit
+                        )
+
+    def test_detail_queries(self):
+        # Рецепт, теги, ингредиенты, автор.
+        for title, client in self.clients():
+            with self.subTest(user=title):
+                with self.assertNumQueries(4):
+                    response = client.get(f'/api/recipes/{self.recipe.id}/')
+                self.assertEqual(response.data['id'], self.recipe.id)
+
+    def test_update_queries(self):
+        # Рецепт, теги, ингредиенты, автор; теги и ингредиенты из
+        # запроса; рецепт и теги; удаление, изменение и создание
+        # количеств; корзины и список покупок; теги и ингредиенты ответа.
+        # Точки сохранения транзакций тоже считаются запросами.
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for count in (1, 3):
+            recipe = Recipe.objects.create(
+                author=self.user, name='Рецепт', text='Описание',
+                image='recipes/test.png', cooking_time=1,
+            )
+            for ingredient in self.ingredients[:2 * count]:
+                IngredientAmount.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+            buyer = User.objects.create(
+                username=f'buyer-{count}', email=f'buyer-{count}@example.com'
+            )
+            ShoppingCart.objects.create(user=buyer, recipe=recipe)
+            # Изменяются, удаляются и создаются по count строк.
+            ingredients = [
+                *self.ingredients[:count],
+                *self.ingredients[2 * count:3 * count],
+            ]
+            with self.subTest(ingredients=count):
+                with self.assertNumQueries(25):
+                    response = client.patch(f'/api/recipes/{recipe.id}/', {
+                        'tags': [tag.id for tag in self.tags[1:]],
+                        'ingredients': [
+                            {'id': ingredient.id, 'amount': 2}
+                            for ingredient in ingredients
+                        ],
+                    }, format='json')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [item['id'] for item in response.data['ingredients']],
+                    [ingredient.id for ingredient in ingredients],
+                )
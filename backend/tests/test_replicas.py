@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from foodgram.replicas import REPLICA, ReplicaMiddleware, primary_reads
+from recipes.models import Recipe
+from rest_framework.authtoken.models import Token
+
+from .test_recipe_queries import CACHES
+
+DATABASES = {**settings.DATABASES, REPLICA: settings.DATABASES['default']}
+
+
+@override_settings(DATABASES=DATABASES, CACHES=CACHES)
+class ReplicaRoutingTest(SimpleTestCase):
+    """Чтение в безопасных запросах идёт на реплику, записи и чтение
+    после записи — в основную базу."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def request(self, method, token='first'):
+        """Выполняет запрос через ReplicaMiddleware и возвращает базы,
+        выбранные внутри представления."""
+        used = {}
+
+        def view(request):
+            used['read'] = Recipe.objects.all().db
+            used['token'] = Token.objects.all().db
+            used['write'] = router.db_for_write(Recipe)
+            with primary_reads():
+                used['primary_reads'] = Recipe.objects.all().db
+            return HttpResponse()
+
+        ReplicaMiddleware(view)(getattr(self.factory, method)(
+            '/api/recipes/', HTTP_AUTHORIZATION=f'Token {token}'
+        ))
+        return dict(used)
+
+    def test_safe_request_reads_replica(self):
+        self.assertEqual(self.request('get'), {
+            'read': REPLICA,
+            'token': DEFAULT_DB_ALIAS,
+            'write': DEFAULT_DB_ALIAS,
+            'primary_reads': DEFAULT_DB_ALIAS,
+        })
+
+    def test_write_request_reads_primary(self):
+        used = self.request('post')
+        self.assertEqual(used['read'], DEFAULT_DB_ALIAS)
+        self.assertEqual(used['write'], DEFAULT_DB_ALIAS)
+
+    def test_client_reads_primary_after_write(self):
+        self.request('post')
+        self.assertEqual(self.request('get')['read'], DEFAULT_DB_ALIAS)
+        self.assertEqual(
+            self.request('get', token='second')['read'], REPLICA
+        )
+
+    def test_reads_outside_request_use_primary(self):
+        self.assertEqual(Recipe.objects.all().db, DEFAULT_DB_ALIAS)
@@ -0,0 +1,136 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from recipes.models import (
+    Ingredient, IngredientAmount, Recipe, ShoppingCart, ShoppingListItem,
+)
+from rest_framework.test import APIClient
+
+from .test_recipe_queries import CACHES
+from api import views
+from users.models import User
+
+
+@override_settings(CACHES=CACHES)
+class ShoppingListTest(TestCase):
+    """Список покупок следует за корзиной и ингредиентами рецептов при
+    любом изменении: через API, в админке и при каскадном удалении."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='author-password',
+        )
+        cls.buyer = User.objects.create(
+            username='buyer', email='buyer@example.com',
+        )
+        cls.first, cls.second, cls.third = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('И1', 'И2', 'И3')
+        )
+        cls.recipe = cls.create_recipe({cls.first: 2, cls.second: 3})
+
+    @classmethod
+    def create_recipe(cls, amounts):
+        recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            image='recipes/recipe.png', cooking_time=10,
+        )
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def downloaded(self):
+        """Строки выгруженного списка покупок: {название: количество}."""
+        with mock.patch.object(
+            views, 'create_pdf', wraps=views.create_pdf
+        ) as create_pdf:
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/'
+            )
+        self.assertEqual(response.status_code, 200)
+        return {
+            row['ingredient__name']: row['sum_amount']
+            for row in create_pdf.call_args[0][0]
+        }
+
+    def assert_shopping_list(self, expected):
+        self.assertEqual(self.downloaded(), expected)
+        self.assertEqual(
+            {
+                (item.user_id, item.ingredient_id): item.amount
+                for item in ShoppingListItem.objects.all()
+            },
+            ShoppingListItem.objects.expected(),
+        )
+
+    def test_cart_added_through_api(self):
+        self.assert_shopping_list({'И1': 2, 'И2': 3})
+
+    def test_author_deleted(self):
+        self.author.delete()
+        self.assertFalse(ShoppingCart.objects.exists())
+        self.assert_shopping_list({})
+
+    def test_author_deleted_own_account(self):
+        author = APIClient()
+        author.force_authenticate(self.author)
+        response = author.delete(
+            '/api/users/me/', {'current_password': 'author-password'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assert_shopping_list({})
+
+    def test_recipe_deleted(self):
+        self.recipe.delete()
+        self.assert_shopping_list({})
+
+    def test_cart_row_edited(self):
+        other = self.create_recipe({self.second: 5})
+        cart = ShoppingCart.objects.get(user=self.buyer)
+        cart.recipe = other
+        cart.save()
+        self.assert_shopping_list({'И2': 5})
+        cart.delete()
+        self.assert_shopping_list({})
+
+    def test_ingredient_amounts_edited(self):
+        amount = self.recipe.amounts.get(ingredient=self.first)
+        amount.amount = 7
+        amount.save()
+        self.assert_shopping_list({'И1': 7, 'И2': 3})
+        amount.ingredient = self.third
+        amount.save()
+        self.assert_shopping_list({'И2': 3, 'И3': 7})
+        IngredientAmount.objects.create(
+            recipe=self.recipe, ingredient=self.first, amount=1
+        )
+        self.assert_shopping_list({'И1': 1, 'И2': 3, 'И3': 7})
+        self.recipe.amounts.filter(ingredient=self.first).delete()
+        self.assert_shopping_list({'И2': 3, 'И3': 7})
+
+    def test_recipe_ingredients_updated_through_api(self):
+        author = APIClient()
+        author.force_authenticate(self.author)
+        response = author.patch(
+            f'/api/recipes/{self.recipe.id}/', {'ingredients': [
+                {'id': self.first.id, 'amount': 4},
+                {'id': self.third.id, 'amount': 1},
+            ]}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_shopping_list({'И1': 4, 'И3': 1})
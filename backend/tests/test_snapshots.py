@@ -0,0 +1,69 @@
+import gzip
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from recipes.models import Ingredient, Tag
+from rest_framework.test import APIClient
+
+from .test_recipe_queries import CACHES
+
+
+@override_settings(CACHES=CACHES)
+class SnapshotListTest(TestCase):
+    """Список тегов отдаётся снимком со строгим ETag: совпавший
+    If-None-Match получает 304, изменение тега меняет ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(100)
+        )
+
+    def setUp(self):
+        # Снимки привязаны к версии справочника, а версии — к кешу.
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+
+    def test_not_modified(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH='"tags-other"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_after_tag_edit(self):
+        response = self.client.get('/api/tags/')
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Обед'
+            self.tag.save()
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Обед')
+
+    def test_gzip_snapshot(self):
+        plain = self.client.get('/api/ingredients/')
+        compressed = self.client.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        # У сжатого и несжатого ответа разные ETag.
+        self.assertEqual(compressed['ETag'], plain['ETag'][:-1] + '-gz"')
+        response = self.client.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=plain['ETag'],
+        )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,94 @@
+from django.test import TestCase, override_settings
+from recipes.models import Recipe
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .test_recipe_queries import CACHES
+from api.serializers import FollowSerializer
+from users.models import Follow, User
+
+URL = '/api/users/subscriptions/'
+
+
+@override_settings(CACHES=CACHES)
+class SubscriptionsTest(TestCase):
+    """Рецепты авторов страницы подписок загружаются одним запросом и
+    совпадают с выборкой по каждому автору отдельно."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='user', email='user@example.com',
+        )
+        for number in range(8):
+            author = User.objects.create(
+                username=f'author-{number}',
+                email=f'author-{number}@example.com',
+            )
+            Follow.objects.create(user=cls.user, author=author)
+            # У авторов от 0 до 7 рецептов.
+            for recipe in range(number):
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {recipe}', text='Описание',
+                    image='recipes/test.png', cooking_time=recipe + 1,
+                )
+        Recipe.objects.create(
+            author=cls.user, name='Свой рецепт', text='Описание',
+            image='recipes/test.png', cooking_time=1,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def params(self, limit, recipes_limit):
+        params = {'limit': limit}
+        if recipes_limit is not None:
+            params['recipes_limit'] = recipes_limit
+        return params
+
+    def per_author(self, params, ids):
+        """Вывод FollowSerializer без предзагрузки: рецепты каждого
+        автора выбираются срезом отдельного запроса."""
+        request = Request(APIRequestFactory().get(URL, params))
+        request.user = self.user
+        return FollowSerializer(
+            User.objects.filter(id__in=ids).order_by('id'), many=True,
+            context={'request': request},
+        ).data
+
+    def test_queries(self):
+        # Количество, страница, рецепты авторов страницы.
+        for limit in (2, 8):
+            for recipes_limit in (None, 1, 3):
+                with self.subTest(limit=limit, recipes_limit=recipes_limit):
+                    with self.assertNumQueries(3):
+                        response = self.client.get(
+                            URL, self.params(limit, recipes_limit)
+                        )
+                    self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipes_truncated_per_author(self):
+        for recipes_limit in (1, 3, 10):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    URL, self.params(8, recipes_limit)
+                )
+                for author in response.data['results']:
+                    expected = list(Recipe.objects.filter(
+                        author_id=author['id']
+                    ).order_by('id').values_list('id', flat=True))
+                    self.assertEqual(
+                        [recipe['id'] for recipe in author['recipes']],
+                        expected[:recipes_limit],
+                    )
+
+    def test_matches_per_author_slicing(self):
+        for limit in (2, 8):
+            for recipes_limit in (None, 1, 3):
+                with self.subTest(limit=limit, recipes_limit=recipes_limit):
+                    params = self.params(limit, recipes_limit)
+                    results = self.client.get(URL, params).data['results']
+                    self.assertEqual(results, self.per_author(
+                        params, [author['id'] for author in results]
+                    ))
@@ -0,0 +1,48 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .test_recipe_queries import CACHES
+from users.models import Follow, User
+
+
+@override_settings(CACHES=CACHES)
+class UserQueriesTest(TestCase):
+    """Число запросов списка пользователей не зависит от размера
+    страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            User.objects.create(
+                username=f'user-{number}',
+                email=f'user-{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(40)
+        ]
+        cls.user = users[0]
+        for author in users[1::3]:
+            Follow.objects.create(user=cls.user, author=author)
+
+    def test_list_queries(self):
+        authorized = APIClient()
+        authorized.force_authenticate(self.user)
+        followed = set(Follow.objects.filter(user=self.user).values_list(
+            'author_id', flat=True
+        ))
+        # Количество и страница; пользователю ещё его подписки.
+        for title, client, queries, subscribed in (
+            ('аноним', APIClient(), 2, set()),
+            ('пользователь', authorized, 3, followed),
+        ):
+            for limit in (6, 30):
+                with self.subTest(user=title, limit=limit):
+                    with self.assertNumQueries(queries):
+                        response = client.get('/api/users/', {'limit': limit})
+                    results = response.data['results']
+                    self.assertEqual(len(results), limit)
+                    self.assertEqual(
+                        [user['is_subscribed'] for user in results],
+                        [user['id'] in subscribed for user in results],
+                    )
@@ -12,6 +12,8 @@ class UserAdmin(UserAdmin):
         'email',
         'first_name',
         'last_name',
+        'recipes_count',
+        'followers_count',
     )
     search_fields = ('id', 'email', 'username', 'first_name', 'last_name')
     list_filter = ('email', 'first_name')
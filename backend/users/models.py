@@ -3,7 +3,28 @@ from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 
 
-class User(AbstractUser):
+class CountersMixin:
+    """Модель со счётчиками, которые меняются только запросами UPDATE
+    с F() (recipes.counters).
+
+    Сохранение существующей строки без update_fields не записывает
+    счётчики: их значения в памяти могли устареть.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not args and not self._state.adding and (
+            kwargs.get('update_fields') is None
+        ) and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersMixin, AbstractUser):
     username_validator = UnicodeUsernameValidator()
     username = models.CharField(
         'Имя пользователя',
@@ -28,6 +49,18 @@ class User(AbstractUser):
     password = models.CharField(
         'Пароль',
         max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        'Число рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = ('id',)
@@ -42,6 +75,18 @@ class User(AbstractUser):
         return self.username
 
 
+def lock_users(user_ids):
+    """Блокирует строки пользователей до конца транзакции.
+
+    Изменения подписок, избранного, корзины и списка покупок
+    пользователя сначала берут эту блокировку, поэтому выполняются
+    по очереди и не ждут друг друга в обратном порядке.
+    """
+    list(User.objects.select_for_update().filter(
+        id__in=user_ids
+    ).order_by('id').values_list('id', flat=True))
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,